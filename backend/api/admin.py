@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import User, Disease, DetectionHistory
+from .models import User, Disease, DetectionHistory, DetectionJob, DailyDetectionStat, UserDetectionStat
 
 admin.site.register(User)
 admin.site.register(Disease)
 admin.site.register(DetectionHistory)
+admin.site.register(DetectionJob)
+admin.site.register(DailyDetectionStat)
+admin.site.register(UserDetectionStat)
@@ -2,15 +2,15 @@ from rest_framework.decorators import api_view, permission_classes, parser_class
 from rest_framework.response import Response
 from rest_framework import permissions
 from rest_framework.parsers import MultiPartParser, FormParser
-from googletrans import Translator
-from PIL import Image
-import numpy as np
-import random
+from concurrent.futures import TimeoutError as FutureTimeout
 
-from .models import Disease, DetectionHistory
+from .models import DetectionHistory
 from .serializers import DiseaseSerializer
-
-translator = Translator()
+from .catalogue import catalogue
+from .inference import registry, ModelUnavailable
+from .batching import predict_tensor
+from .preprocessing import load_image, ImageRejected
+from .prefilter import check_crop
 
 
 @api_view(['POST'])
@@ -23,80 +23,37 @@ def ai_detect(request):
 
     # --- Validate image ---
     try:
-        image = Image.open(img).convert('RGB').resize((224, 224))
-        arr = np.asarray(image).astype('float32')
-        r, g, b = arr[:, :, 0], arr[:, :, 1], arr[:, :, 2]
-        green_score = float(np.mean(g - ((r + b) / 2.0)))
-        if green_score < 5.0:
+        prepared = load_image(img, registry.input_size())
+        if not check_crop(prepared.tensor).passed:
             return Response({"error": "Please upload a valid crop image"}, status=400)
-        img.seek(0)
+    except ImageRejected as e:
+        return Response({"error": str(e)}, status=400)
     except Exception as e:
         return Response({"error": f"Invalid image format: {str(e)}"}, status=400)
 
-    # --- Mock AI logic (load default diseases if empty) ---
-    diseases = Disease.objects.all()
-    if not diseases.exists():
-        defaults = [
-            {
-                'name': 'Banana Bacterial Wilt',
-                'species': 'Banana',
-                'description': 'Bacterial disease causing wilting and yellowing.',
-                'treatment': 'Rogue infected plants, sanitize tools, use clean planting material.',
-                'care_tips': 'Maintain field hygiene; use resistant varieties; avoid tool sharing between fields.'
-            },
-            {
-                'name': 'Maize Leaf Blight',
-                'species': 'Maize',
-                'description': 'Fungal leaf spots reducing photosynthesis.',
-                'treatment': 'Rotate crops, remove residue, apply recommended fungicide if severe.',
-                'care_tips': 'Ensure spacing for airflow; balanced fertilization; timely weeding.'
-            },
-            {
-                'name': 'Potato Late Blight',
-                'species': 'Potato',
-                'description': 'Oomycete disease causing dark lesions on leaves and tubers.',
-                'treatment': 'Use certified seed, ensure airflow, apply protective fungicide as advised.',
-                'care_tips': 'Avoid overhead irrigation late in day; remove infected leaves; monitor weather alerts.'
-            },
-        ]
-        for d in defaults:
-            Disease.objects.get_or_create(
-                name=d['name'], species=d['species'],
-                defaults={
-                    'description': d['description'],
-                    'treatment': d['treatment'],
-                    'care_tips': d['care_tips']
-                }
-            )
-        diseases = Disease.objects.all()
-
-    # --- Random selection and translation ---
+    # --- Model prediction and translation ---
     try:
-        disease = random.choice(list(diseases))
-        confidence = round(random.uniform(0.7, 0.99), 2)
-        disease_data = DiseaseSerializer(disease).data
+        prediction = predict_tensor(prepared.tensor)
+    except (ModelUnavailable, FutureTimeout) as e:
+        print("Model unavailable:", e)
+        return Response({"error": "Detection model is not available. Please try again later."}, status=503)
 
-        #  Translate with fallback
-        def safe_translate(text):
-            try:
-                return translator.translate(text, src='en', dest='rw').text
-            except Exception:
-                return text  # fallback to English
+    try:
+        disease = catalogue.get(prediction.label)
+        confidence = prediction.confidence
+        disease_data = DiseaseSerializer(disease).data if disease else {}
 
-        translated = {
-            'name_rw': safe_translate(disease.name),
-            'description_rw': safe_translate(disease.description),
-            'treatment_rw': safe_translate(disease.treatment),
-            'care_tips_rw': safe_translate(disease.care_tips),
-        }
+        # Kinyarwanda text is precomputed on the Disease row
+        translated = disease.translation() if disease else {}
 
         result = {
             'status': 'success',
+            'predicted_class': prediction.label,
             'predicted_disease': disease_data,
             'confidence': confidence,
-            'recommendation': disease.treatment,
-            'crop_name': disease.species,
-            'care_tips': disease.care_tips,
+            'recommendation': disease.treatment if disease else '',
+            'crop_name': disease.species if disease else '',
+            'care_tips': disease.care_tips if disease else '',
             'translation': translated
         }
 
@@ -108,7 +65,7 @@ def ai_detect(request):
     detection = DetectionHistory.objects.create(
         user=request.user,
         image=img,
-        predicted_disease=disease if diseases.exists() else None,
+        predicted_disease=disease,
         confidence=result.get('confidence', 0)
     )
     result['id'] = detection.id
@@ -0,0 +1,190 @@
+"""
+Incrementally maintained detection statistics.
+
+Every saved or deleted DetectionHistory row adjusts two small rollup
+tables (see api/signals.py; bulk inserts call ``record_many`` directly), so
+the analytics endpoint aggregates a few thousand rollup rows instead of
+scanning the raw history table.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import DailyDetectionStat, UserDetectionStat
+
+BUCKETS = 10
+
+
+def confidence_bucket(confidence):
+    return min(max(int(confidence * BUCKETS), 0), BUCKETS - 1)
+
+
+def _bump(model, lookup, count, total, defaults=None, updates=None):
+    """Atomically add ``count``/``total`` to a rollup row, creating it if needed."""
+    if count < 0:
+        _take(model, lookup, -count, -total)
+        return
+    updates = updates or {}
+    changes = dict(count=F('count') + count, confidence_sum=F('confidence_sum') + total, **updates)
+    # NULL diseases are not covered by the unique constraint, so more than one
+    # row can match; only ever adjust one of them (reads sum them anyway).
+    target = model.objects.filter(pk__in=model.objects.filter(**lookup).order_by('pk').values('pk')[:1])
+    if target.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), count=count, confidence_sum=total)
+    except IntegrityError:
+        # Another request created the row first
+        target.update(**changes)
+
+
+def _take(model, lookup, count, total):
+    """
+    Subtract ``count``/``total`` from the rows matching ``lookup``. Several
+    rows can match once a disease is deleted (SET_NULL); take from the
+    fullest first and never below zero, which the count column's CHECK
+    constraint would reject.
+    """
+    rows = model.objects.filter(**lookup, count__gt=0).order_by('-count', 'pk').values_list('pk', 'count')
+    remaining = count
+    for pk, available in rows:
+        taken = min(available, remaining)
+        model.objects.filter(pk=pk, count__gte=taken).update(
+            count=F('count') - taken, confidence_sum=F('confidence_sum') - total * taken / count
+        )
+        remaining -= taken
+        if not remaining:
+            break
+
+
+def _apply(detections, sign):
+    daily = defaultdict(lambda: [0, 0.0, ''])
+    users = defaultdict(lambda: [0, 0.0, None])
+    for detection in detections:
+        disease = detection.predicted_disease
+        day = timezone.localdate(detection.detected_at)
+        entry = daily[(day, detection.predicted_disease_id, confidence_bucket(detection.confidence))]
+        entry[0] += sign
+        entry[1] += sign * detection.confidence
+        entry[2] = disease.species if disease else ''
+
+        entry = users[detection.user_id]
+        entry[0] += sign
+        entry[1] += sign * detection.confidence
+        if entry[2] is None or detection.detected_at > entry[2]:
+            entry[2] = detection.detected_at
+
+    with transaction.atomic():
+        for (day, disease_id, bucket), (count, total, species) in daily.items():
+            _bump(
+                DailyDetectionStat,
+                dict(day=day, disease_id=disease_id, confidence_bucket=bucket),
+                count, total, defaults=dict(species=species),
+            )
+        for user_id, (count, total, last_detected_at) in users.items():
+            updates = {}
+            if sign > 0:
+                updates['last_detected_at'] = Greatest(Coalesce('last_detected_at', last_detected_at), last_detected_at)
+            _bump(
+                UserDetectionStat, dict(user_id=user_id), count, total,
+                defaults=dict(last_detected_at=last_detected_at), updates=updates,
+            )
+
+
+def record_many(detections):
+    """Add newly created detections to the rollups."""
+    _apply(detections, 1)
+
+
+def record(detection):
+    _apply([detection], 1)
+
+
+def forget(detection):
+    """Remove a deleted detection from the rollups."""
+    _apply([detection], -1)
+
+
+def _mean(total, count):
+    return round(total / count, 4) if count else None
+
+
+def summary(days=30, top_users=50):
+    """Aggregates for the last ``days`` days (per-user totals are all-time)."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    daily = DailyDetectionStat.objects.filter(day__gte=since)
+    totals = daily.aggregate(count=Sum('count'), confidence_sum=Sum('confidence_sum'))
+
+    per_disease = (
+        daily.values('disease_id', 'disease__name', 'species')
+        .annotate(count=Sum('count'), confidence_sum=Sum('confidence_sum'))
+        .order_by('-count')
+    )
+    per_species = daily.values('species').annotate(count=Sum('count')).order_by('-count')
+    per_day = daily.values('day').annotate(count=Sum('count')).order_by('day')
+    buckets = dict(daily.values_list('confidence_bucket').annotate(count=Sum('count')))
+    per_user = UserDetectionStat.objects.select_related('user').filter(count__gt=0).order_by('-count')[:top_users]
+
+    return {
+        'since': since,
+        'days': days,
+        'total_detections': totals['count'] or 0,
+        'mean_confidence': _mean(totals['confidence_sum'] or 0.0, totals['count'] or 0),
+        'per_disease': [
+            {
+                'disease_id': row['disease_id'],
+                'name': row['disease__name'] or 'Unclassified',
+                'species': row['species'],
+                'count': row['count'],
+                'mean_confidence': _mean(row['confidence_sum'], row['count']),
+            }
+            for row in per_disease if row['count']
+        ],
+        'per_species': [
+            {'species': row['species'] or 'Unknown', 'count': row['count']}
+            for row in per_species if row['count']
+        ],
+        'per_day': [{'day': row['day'], 'count': row['count']} for row in per_day if row['count']],
+        'confidence_histogram': [
+            {
+                'range': f"{bucket / BUCKETS:.1f}-{(bucket + 1) / BUCKETS:.1f}",
+                'count': buckets.get(bucket, 0),
+            }
+            for bucket in range(BUCKETS)
+        ],
+        'per_user': [
+            {
+                'user_id': stat.user_id,
+                'username': stat.user.username,
+                'count': stat.count,
+                'mean_confidence': _mean(stat.confidence_sum, stat.count),
+                'last_detected_at': stat.last_detected_at,
+            }
+            for stat in per_user
+        ],
+    }
+
+
+def rebuild(chunk_size=5000):
+    """Recompute every rollup from the raw history table; returns rows processed."""
+    from .models import DetectionHistory
+
+    with transaction.atomic():
+        DailyDetectionStat.objects.all().delete()
+        UserDetectionStat.objects.all().delete()
+        processed = 0
+        chunk = []
+        queryset = DetectionHistory.objects.select_related('predicted_disease').order_by('id')
+        for detection in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(detection)
+            if len(chunk) == chunk_size:
+                record_many(chunk)
+                processed += len(chunk)
+                chunk = []
+        record_many(chunk)
+        return processed + len(chunk)
@@ -0,0 +1,208 @@
+"""
+Async detection and history views for the ASGI deployment.
+
+Served by ``cropdetector.asgi:application`` (e.g. under uvicorn), the
+request body is received by the event loop, database access uses Django's
+async ORM, and CPU-bound hashing/decoding/inference runs on a bounded
+thread pool or the shared batching scheduler. A worker can therefore hold
+hundreds of slow mobile uploads without tying up a thread per upload.
+That needs every middleware to be async-capable; cropdetector/asgi.py
+serves static files outside the middleware chain because WhiteNoise is not.
+
+DRF views are sync-only, so these are plain Django views that
+authenticate the JWT themselves and accept the same parameters (`mode`,
+`async`) and return JSON in the same shape as their counterparts in
+api/views.py.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import metrics
+from .authentication import CachedJWTAuthentication
+from .catalogue import catalogue
+from .dedup import content_hash, lookup, remember
+from .detection import detection_result
+from .models import DetectionHistory
+from .serializers import DetectionHistoryListSerializer
+from .timing import StageTimer
+
+# Like api/views.py, the NumPy/Pillow/model pipeline is imported on first use
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.CROP_ASYNC_EXECUTOR_WORKERS, thread_name_prefix='crop-async'
+)
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, safe=False)
+
+
+async def _run(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def authenticate(request):
+    """Validate the Bearer token without blocking the event loop; returns a user or None."""
+    auth = CachedJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        validated = auth.get_validated_token(raw_token)
+        return await sync_to_async(auth.get_user)(validated)
+    except AuthenticationFailed:
+        return None
+
+
+def _decode(img, mode):
+    from .inference import registry
+    from .preprocessing import load_image
+    from . import tta
+
+    input_size = registry.input_size()
+    return load_image(img, tta.decode_size(input_size) if mode == 'tta' else input_size)
+
+
+def _check(prepared):
+    from .prefilter import check_crop
+    return check_crop(prepared.tensor)
+
+
+async def _predict(tensor):
+    from .batching import scheduler, predict_tensor
+    from .inference import registry
+
+    if not settings.CROP_BATCHING_ENABLED:
+        return await _run(predict_tensor, tensor)
+    classifier = await _run(registry.get)
+    probabilities = await asyncio.wait_for(
+        asyncio.wrap_future(scheduler.submit(tensor)), settings.CROP_INFERENCE_TIMEOUT
+    )
+    return classifier.decode(probabilities)
+
+
+@csrf_exempt
+@require_POST
+async def ai_detect(request):
+    """The async counterpart of api/views.py's ai_detect, including `mode=tta` and `async=true`."""
+    timer = StageTimer()
+    user = await authenticate(request)
+    if user is None:
+        return _json({"detail": "Authentication credentials were not provided."}, status=401)
+
+    with timer.stage('upload'):
+        img = request.FILES.get('image')
+    if not img:
+        return _json({"error": "Image is required"}, status=400)
+    from .inference import ModelUnavailable
+    from .jobs import enqueue
+    from .preprocessing import ImageRejected
+    from . import tta
+
+    mode = str(request.POST.get('mode', request.GET.get('mode', 'standard'))).lower()
+    if mode not in ('standard', 'tta'):
+        return _json({"error": "mode must be 'standard' or 'tta'"}, status=400)
+    if mode == 'tta' and not settings.CROP_TTA_ENABLED:
+        mode = 'standard'
+
+    with timer.stage('hash'):
+        digest = await _run(content_hash, img)
+    with timer.stage('lookup'):
+        cached = await sync_to_async(lookup)(digest, user, mode)
+    if cached is not None:
+        cached['timings_ms'] = timer.as_dict()
+        metrics.record_stages('async_ai_detect', timer)
+        metrics.detections.inc(endpoint='async_ai_detect', mode='cached')
+        return _json(cached)
+
+    try:
+        with timer.stage('decode'):
+            prepared = await _run(_decode, img, mode)
+    except ImageRejected as e:
+        return _json({"error": str(e)}, status=400)
+    except Exception as e:
+        return _json({"error": f"Invalid image format: {str(e)}"}, status=400)
+    with timer.stage('prefilter'):
+        check = await _run(_check, prepared)
+    if not check.passed:
+        return _json({"error": "Please upload a valid crop image"}, status=400)
+
+    async_flag = request.POST.get('async', request.GET.get('async', ''))
+    if str(async_flag).lower() in ('1', 'true', 'yes'):
+        job = await sync_to_async(enqueue)(user, img, mode)
+        return _json({
+            'status': job.status,
+            'job_id': job.id,
+            'status_url': request.build_absolute_uri(reverse('detection_job', args=[job.id])),
+        }, status=202)
+
+    views = None
+    try:
+        if mode == 'tta':
+            prediction, views = await _run(tta.predict, prepared.image, timer)
+        else:
+            with timer.stage('inference'):
+                prediction = await _predict(prepared.tensor)
+    except (ModelUnavailable, asyncio.TimeoutError):
+        return _json({
+            'status': 'error',
+            'message': 'Detection model is not available. Please try again later.'
+        }, status=503)
+
+    with timer.stage('translation'):
+        disease = await sync_to_async(catalogue.get)(prediction.label)
+        result = detection_result(prediction, disease)
+    result['mode'] = mode
+    if views is not None:
+        result['views'] = views
+
+    try:
+        with timer.stage('save'):
+            detection = await DetectionHistory.objects.acreate(
+                user=user,
+                image=img,
+                predicted_disease=disease,
+                confidence=prediction.confidence
+            )
+        result['detection_id'] = detection.id
+        result['detected_at'] = detection.detected_at
+        remember(digest, user, detection, result, mode)
+    except Exception as e:
+        print(f"History save error: {e}")
+
+    result['timings_ms'] = timer.as_dict()
+    metrics.record_stages('async_ai_detect', timer)
+    metrics.detections.inc(endpoint='async_ai_detect', mode=mode)
+    return _json(result)
+
+
+@csrf_exempt
+@require_GET
+async def history(request):
+    """Newest detections first; `?limit=` caps the page (default 50, max 200)."""
+    user = await authenticate(request)
+    if user is None:
+        return _json({"detail": "Authentication credentials were not provided."}, status=401)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+    except ValueError:
+        limit = 50
+
+    queryset = DetectionHistory.objects.select_related('user', 'predicted_disease').order_by('-detected_at', '-id')
+    if not (user.is_staff or getattr(user, 'is_expert', False)):
+        queryset = queryset.filter(user=user)
+    rows = [row async for row in queryset[:limit]]
+
+    data = DetectionHistoryListSerializer(rows, many=True, context={'request': request}).data
+    return _json(data)
@@ -0,0 +1,71 @@
+"""
+JWT authentication that skips the per-request user query.
+
+simplejwt's JWTAuthentication verifies the token signature and loads the
+User row on every request. History and job-status polling send the same
+token over and over, so each worker keeps:
+
+- the validated token, keyed by a hash of the raw token, until it expires;
+- the User, keyed by id, for at most CROP_AUTH_CACHE_TTL seconds.
+
+A user saved or deleted in this process is dropped straight away (see
+api/signals.py). Changes made through another worker, such as an admin
+deactivating an account, or with QuerySet.update() (which sends no
+signal), take effect after at most CROP_AUTH_CACHE_TTL seconds: until
+then a deactivated user can still authenticate on the other workers.
+Keep the TTL short.
+"""
+import copy
+import hashlib
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import LRUCache
+
+tokens = LRUCache(maxsize=settings.CROP_AUTH_CACHE_MAX_ENTRIES)
+users = LRUCache(maxsize=settings.CROP_AUTH_CACHE_MAX_ENTRIES, ttl=settings.CROP_AUTH_CACHE_TTL)
+
+
+def forget_user(user_id):
+    users.pop(str(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_validated_token(self, raw_token):
+        key = hashlib.sha256(raw_token).digest()
+        validated = tokens.get(key)
+        if validated is None:
+            validated = super().get_validated_token(raw_token)
+            remaining = validated.get('exp', 0) - time.time()
+            if remaining > 0:
+                tokens.set(key, validated, ttl=remaining)
+        elif validated.get('exp', 0) <= time.time():
+            tokens.pop(key)
+            raise InvalidToken("Token is expired")
+        return validated
+
+    def get_user(self, validated_token):
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        user = users.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            users.set(user_id, user)
+        elif not user.is_active:
+            users.pop(user_id)
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        elif api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        # Each request gets its own instance; views may modify request.user
+        return copy.copy(user)
@@ -0,0 +1,104 @@
+"""
+Micro-batching scheduler for the crop classifier.
+
+Request threads decode their own image (see ``api.preprocessing``) and
+submit the tensor here. A single background thread per worker process
+collects whatever arrives within
+``CROP_BATCH_MAX_WAIT_MS`` (or until ``CROP_BATCH_MAX_SIZE`` images are
+waiting), runs them through the model as one batched tensor and hands each
+result back to the thread that is waiting for it.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from django.conf import settings
+
+from .inference import registry
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+
+    def __init__(self, max_batch_size=None, max_wait_ms=None, get_classifier=None):
+        self.max_batch_size = max_batch_size or settings.CROP_BATCH_MAX_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.CROP_BATCH_MAX_WAIT_MS) / 1000.0
+        self._get_classifier = get_classifier or registry.get
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='crop-batcher', daemon=True)
+                self._thread.start()
+
+    def pending(self):
+        """Number of images waiting for the next batch."""
+        return self._queue.qsize()
+
+    def submit(self, array):
+        """Queue one preprocessed (H, W, 3) array; the Future resolves to its probability row."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((array, future))
+        return future
+
+    def predict(self, tensor, timeout=None):
+        """Submit one preprocessed image and wait for its batched Prediction."""
+        classifier = self._get_classifier()
+        probabilities = self.submit(tensor).result(timeout=timeout)
+        return classifier.decode(probabilities)
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the window closes."""
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            futures = [future for _, future in items]
+            try:
+                batch = np.stack([array for array, _ in items]).astype(np.float32, copy=False)
+                probabilities = self._get_classifier().predict_batch(batch)
+            except Exception as exc:
+                logger.exception("Batched inference failed for %d images", len(items))
+                for future in futures:
+                    future.set_exception(exc)
+                continue
+            for future, row in zip(futures, probabilities):
+                future.set_result(row)
+
+
+scheduler = BatchScheduler()
+
+
+def predict_tensor(tensor):
+    """Classify one preprocessed image, sharing a forward pass with concurrent requests when batching is on."""
+    if settings.CROP_BATCHING_ENABLED:
+        return scheduler.predict(tensor, timeout=settings.CROP_INFERENCE_TIMEOUT)
+    classifier = registry.get()
+    return classifier.decode(classifier.predict_batch(tensor[np.newaxis, ...])[0])
@@ -0,0 +1,118 @@
+"""
+Per-worker, in-memory copy of the Disease table.
+
+Detection maps a model label to a Disease by name on every request; the
+catalogue answers that from memory. It is rebuilt on the next lookup after
+a Disease is saved or deleted in this process (see api/signals.py), and at
+the latest after CROP_CATALOGUE_TTL seconds so changes made through
+another worker are picked up too.
+
+The catalogue also keeps the published (serialized) /api/diseases/ list
+and detail bodies with their ETags, for conditional GETs. Before serving
+them, it checks the table's row count and latest ``updated_at``. That is
+one aggregate query, and it catches a save or delete made by any worker.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Count, Max
+from rest_framework.renderers import JSONRenderer
+
+from .models import Disease
+from .serializers import DiseaseSerializer
+
+
+@dataclass
+class Representation:
+    body: bytes
+    etag: str
+    last_modified: object  # datetime, or None for an empty catalogue
+
+
+@dataclass
+class Published:
+    fingerprint: tuple
+    listing: Representation
+    by_id: dict
+
+
+def _represent(data, last_modified):
+    body = JSONRenderer().render(data)
+    return Representation(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"', last_modified)
+
+
+class DiseaseCatalogue:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name = None
+        self._loaded_at = 0.0
+        self._published = None
+
+    def _load(self):
+        return self._index(Disease.objects.order_by('id'))
+
+    def _index(self, rows):
+        by_name = {}
+        for disease in rows:
+            by_name.setdefault(disease.name, disease)
+        return by_name
+
+    def _is_stale(self, by_name):
+        return by_name is None or time.monotonic() - self._loaded_at > settings.CROP_CATALOGUE_TTL
+
+    def _entries(self):
+        by_name = self._by_name
+        if self._is_stale(by_name):
+            with self._lock:
+                if self._is_stale(self._by_name):
+                    self._by_name = self._load()
+                    self._loaded_at = time.monotonic()
+                by_name = self._by_name
+        return by_name
+
+    def get(self, name):
+        """The Disease a model label refers to, or None (e.g. "Healthy")."""
+        return self._entries().get(name)
+
+    def all(self):
+        return list(self._entries().values())
+
+    def fingerprint(self):
+        """(row count, latest updated_at): changes with every save or delete, from any worker."""
+        stats = Disease.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+        return stats['count'], stats['latest']
+
+    def published(self):
+        """Serialized list and detail bodies for DiseaseViewSet, current as of this call."""
+        fingerprint = self.fingerprint()
+        published = self._published
+        if published is not None and published.fingerprint == fingerprint:
+            return published
+        with self._lock:
+            rows = list(Disease.objects.order_by('id'))
+            data = DiseaseSerializer(rows, many=True).data
+            published = Published(
+                fingerprint=fingerprint,
+                listing=_represent(data, fingerprint[1]),
+                by_id={
+                    disease.pk: _represent(item, disease.updated_at)
+                    for disease, item in zip(rows, data)
+                },
+            )
+            self._published = published
+            # Same rows: refresh the lookup table too
+            self._by_name = self._index(rows)
+            self._loaded_at = time.monotonic()
+        return published
+
+    def invalidate(self):
+        with self._lock:
+            self._by_name = None
+            self._published = None
+
+
+catalogue = DiseaseCatalogue()
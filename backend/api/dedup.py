@@ -0,0 +1,90 @@
+"""
+Content-addressed cache for repeated detection uploads.
+
+Farmers on flaky connections often resubmit the same photo. Uploads are
+keyed by the SHA-256 of their bytes: a resubmission by the same user gets
+the original response back unchanged, and the same photo from another
+user gets a new history row that points at the already stored file.
+Entries are also keyed by detection mode, so a standard upload is never
+answered with a test-time-augmentation result (api/tta.py) or vice versa.
+"""
+import copy
+import hashlib
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from .cache import LRUCache
+from .models import DetectionHistory
+from .uploads import upload_digest
+
+
+@dataclass
+class CachedDetection:
+    user_id: int
+    detection_id: int
+    disease_id: int
+    image_name: str
+    result: dict
+
+
+cache = LRUCache(maxsize=settings.CROP_DEDUP_MAX_ENTRIES, ttl=settings.CROP_DEDUP_TTL)
+
+
+def content_hash(upload):
+    """SHA-256 hex digest of an uploaded file, leaving it rewound."""
+    received = upload_digest(upload)
+    if received:
+        return received
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def _key(digest, mode):
+    return digest if mode == 'standard' else f"{mode}:{digest}"
+
+
+def lookup(digest, user, mode='standard'):
+    """Return the response for a previously seen upload in this mode, or None."""
+    if not settings.CROP_DEDUP_ENABLED:
+        return None
+    entry = cache.get(_key(digest, mode))
+    if entry is None:
+        return None
+
+    result = copy.deepcopy(entry.result)
+    result['cached'] = True
+    if entry.user_id == user.id:
+        return result
+
+    # Same photo from another account: record it without storing the file again
+    detection = DetectionHistory.objects.create(
+        user=user,
+        image=entry.image_name,
+        predicted_disease_id=entry.disease_id,
+        confidence=result['confidence'],
+    )
+    result['detection_id'] = detection.id
+    result['detected_at'] = detection.detected_at
+    return result
+
+
+def remember(digest, user, detection, result, mode='standard'):
+    """Cache the response for a freshly stored detection."""
+    if not settings.CROP_DEDUP_ENABLED or detection is None:
+        return
+    cache.set(_key(digest, mode), CachedDetection(
+        user_id=user.id,
+        detection_id=detection.id,
+        disease_id=detection.predicted_disease_id,
+        image_name=detection.image.name,
+        result=copy.deepcopy(result),
+    ))
+
+
+def forget_detection(detection_id):
+    """Drop cache entries that point at a deleted detection."""
+    return cache.discard_where(lambda entry: entry.detection_id == detection_id)
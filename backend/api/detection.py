@@ -0,0 +1,18 @@
+from .serializers import DiseaseSerializer
+
+
+def detection_result(prediction, disease):
+    """Build the response body for one prediction and its (optional) Disease row."""
+    # Kinyarwanda text is stored on the Disease row when it is saved
+    translated = disease.translation() if disease else {}
+
+    return {
+        'status': 'success',
+        'predicted_class': prediction.label,
+        'predicted_disease': DiseaseSerializer(disease).data if disease else None,
+        'confidence': prediction.confidence,
+        'recommendation': disease.treatment if disease else '',
+        'crop_name': disease.species if disease else '',
+        'care_tips': disease.care_tips if disease else '',
+        'translation': translated,
+    }
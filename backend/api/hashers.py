@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with its costs taken from CROP_ARGON2_* settings. Django's own
+    defaults (100 MiB and 8 lanes per hash) are sized for a dedicated login
+    server, not for small shared workers. Changing the costs re-hashes each
+    password at its next login.
+    """
+    time_cost = settings.CROP_ARGON2_TIME_COST
+    memory_cost = settings.CROP_ARGON2_MEMORY_COST
+    parallelism = settings.CROP_ARGON2_PARALLELISM
@@ -0,0 +1,316 @@
+"""
+Process-wide registry for the crop disease classifier.
+
+The model is loaded once per worker process (see ``cropdetector/wsgi.py``)
+and kept resident, so a detection request only pays for the forward pass.
+CROP_MODEL_BACKEND picks the runtime: the Keras model itself, or an ONNX /
+TFLite export of it (``python manage.py export_model``), which only needs
+onnxruntime or tflite-runtime and never imports TensorFlow.
+"""
+import importlib
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .preprocessing import to_tensor
+
+logger = logging.getLogger(__name__)
+
+
+class ModelUnavailable(Exception):
+    """Raised when the classifier is not configured or failed to load."""
+
+
+@dataclass
+class Prediction:
+    label: str
+    confidence: float
+    index: int
+
+
+def softmax(logits):
+    """Row-wise softmax that is safe for large logits."""
+    logits = np.asarray(logits, dtype=np.float32)
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _as_probabilities(outputs):
+    """Return softmax probabilities whether the model emits logits or probabilities."""
+    outputs = np.asarray(outputs, dtype=np.float32)
+    sums = outputs.sum(axis=-1)
+    if outputs.min() >= 0.0 and np.allclose(sums, 1.0, atol=1e-3):
+        return outputs
+    return softmax(outputs)
+
+
+class Classifier:
+    """A loaded model plus the class labels it was trained on."""
+
+    def __init__(self, model, labels, input_size=(224, 224)):
+        self.model = model
+        self.labels = list(labels)
+        self.input_size = tuple(input_size)
+
+    def preprocess(self, image):
+        """Resize an already-decoded PIL image to the model input and scale it to [0, 1]."""
+        return to_tensor(image.convert('RGB').resize(self.input_size))
+
+    def predict_batch(self, batch):
+        """Run a (N, H, W, 3) float32 batch and return (N, classes) probabilities."""
+        outputs = self.model(batch, training=False)
+        if hasattr(outputs, 'numpy'):
+            outputs = outputs.numpy()
+        probabilities = _as_probabilities(outputs)
+        if probabilities.shape[-1] != len(self.labels):
+            raise ModelUnavailable(
+                f"Model returned {probabilities.shape[-1]} classes "
+                f"but {len(self.labels)} labels are configured"
+            )
+        return probabilities
+
+    def decode(self, probabilities):
+        """Turn one probability row into a Prediction."""
+        index = int(np.argmax(probabilities))
+        return Prediction(
+            label=self.labels[index],
+            confidence=round(float(probabilities[index]), 4),
+            index=index,
+        )
+
+    def predict(self, image):
+        """Classify a single PIL image."""
+        batch = self.preprocess(image)[np.newaxis, ...]
+        return self.decode(self.predict_batch(batch)[0])
+
+
+def load_labels(path):
+    """Labels are stored as a JSON list, in the model's output order."""
+    with open(path, encoding='utf-8') as fh:
+        labels = json.load(fh)
+    if not isinstance(labels, list) or not labels:
+        raise ModelUnavailable(f"Label file {path} must contain a non-empty JSON list")
+    return [str(label) for label in labels]
+
+
+def load_keras_model(path):
+    """Load a .keras/.h5 file or a SavedModel directory with TensorFlow."""
+    try:
+        import tensorflow as tf
+    except ImportError as exc:
+        raise ModelUnavailable("TensorFlow is not installed") from exc
+    return tf.keras.models.load_model(path, compile=False)
+
+
+class OnnxModel:
+    """An ONNX Runtime session behind the same call signature as a Keras model."""
+
+    def __init__(self, path, threads=0):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise ModelUnavailable("onnxruntime is not installed") from exc
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = list(model_input.shape)
+        # Exports from channels-first frameworks take (N, 3, H, W)
+        self.channels_first = len(shape) == 4 and shape[1] == 3 and shape[3] != 3
+        if self.channels_first:
+            shape = [shape[0], shape[2], shape[3], shape[1]]
+        self.fixed_batch = shape[0] if isinstance(shape[0], int) else None
+        self.input_shape = tuple(dim if isinstance(dim, int) else None for dim in shape)
+
+    def _run(self, batch):
+        if self.channels_first:
+            batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def __call__(self, batch, training=False):
+        if self.fixed_batch and len(batch) != self.fixed_batch:
+            return np.concatenate([self._run(batch[i:i + 1]) for i in range(len(batch))])
+        return self._run(batch)
+
+
+class TFLiteModel:
+    """A TFLite interpreter (optionally int8) behind the same call signature as a Keras model."""
+
+    def __init__(self, path, threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tensorflow.lite import Interpreter
+            except ImportError as exc:
+                raise ModelUnavailable("tflite-runtime is not installed") from exc
+        options = {}
+        if settings.CROP_TFLITE_SHARED_WEIGHTS:
+            # Builtin kernels read constant tensors straight from the mmapped
+            # file, so every worker shares one copy of the weights; the default
+            # XNNPACK delegate would repack them into per-process memory
+            try:
+                from tflite_runtime.interpreter import OpResolverType
+            except ImportError:
+                from tensorflow.lite.experimental import OpResolverType
+            options['experimental_op_resolver_type'] = OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        # model_path (not model_content) makes TFLite mmap the file read-only
+        self.interpreter = Interpreter(model_path=path, num_threads=threads or None, **options)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.input_shape = (None, *[int(dim) for dim in self.input['shape'][1:]])
+        self._batch_size = int(self.input['shape'][0])
+        # One interpreter holds one set of tensors: calls must not overlap
+        self._lock = threading.Lock()
+
+    def __call__(self, batch, training=False):
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input['index'], list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self.output = self.interpreter.get_output_details()[0]
+                self._batch_size = len(batch)
+
+            scale, zero_point = self.input['quantization']
+            if self.input['dtype'] != np.float32 and scale:
+                # Fully integer model: quantize the [0, 1] input ourselves
+                info = np.iinfo(self.input['dtype'])
+                batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+            self.interpreter.set_tensor(self.input['index'], batch.astype(self.input['dtype'], copy=False))
+            self.interpreter.invoke()
+            outputs = self.interpreter.get_tensor(self.output['index'])
+
+        scale, zero_point = self.output['quantization']
+        if self.output['dtype'] != np.float32 and scale:
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+        return outputs
+
+
+def load_onnx_model(path):
+    return OnnxModel(path, threads=settings.CROP_MODEL_THREADS)
+
+
+def load_tflite_model(path):
+    return TFLiteModel(path, threads=settings.CROP_MODEL_THREADS)
+
+
+RUNTIME_MODULES = {
+    'keras': 'tensorflow',
+    'onnx': 'onnxruntime',
+    'tflite': 'tflite_runtime.interpreter',
+}
+
+MODEL_LOADERS = {
+    'keras': load_keras_model,
+    'onnx': load_onnx_model,
+    'tflite': load_tflite_model,
+}
+
+
+def _input_size(model):
+    shape = getattr(model, 'input_shape', None)
+    if shape and len(shape) == 4 and shape[1] and shape[2]:
+        return (int(shape[2]), int(shape[1]))
+    return tuple(settings.CROP_MODEL_INPUT_SIZE)
+
+
+class ModelRegistry:
+    """Holds the single classifier instance shared by all request threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._classifier = None
+
+    def load(self, model_path=None, labels_path=None):
+        model_path = Path(model_path or settings.CROP_MODEL_PATH)
+        labels_path = Path(labels_path or settings.CROP_MODEL_LABELS)
+        if not model_path.exists():
+            raise ModelUnavailable(f"Model not found at {model_path}")
+        if not labels_path.exists():
+            raise ModelUnavailable(f"Labels not found at {labels_path}")
+
+        labels = load_labels(labels_path)
+        loader = MODEL_LOADERS.get(settings.CROP_MODEL_BACKEND)
+        if loader is None:
+            raise ModelUnavailable(f"Unknown CROP_MODEL_BACKEND {settings.CROP_MODEL_BACKEND!r}")
+        try:
+            model = loader(str(model_path))
+        except ModelUnavailable:
+            raise
+        except Exception as exc:
+            raise ModelUnavailable(f"Could not load model {model_path}: {exc}") from exc
+        logger.info(
+            "Loaded %s crop model %s with %d classes",
+            settings.CROP_MODEL_BACKEND, model_path, len(labels)
+        )
+        return Classifier(model, labels, _input_size(model))
+
+    def import_runtime(self):
+        """
+        Import the configured backend's library without building a model.
+        Safe before fork (TensorFlow and ONNX Runtime thread pools are not),
+        so a preloading gunicorn master can share the library's pages.
+        """
+        module = RUNTIME_MODULES.get(settings.CROP_MODEL_BACKEND)
+        if module is None:
+            return False
+        try:
+            importlib.import_module(module)
+            return True
+        except ImportError:
+            return False
+
+    def get(self):
+        """Return the resident classifier, loading it on first use."""
+        classifier = self._classifier
+        if classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    self._classifier = self.load()
+                classifier = self._classifier
+        return classifier
+
+    def input_size(self):
+        """(width, height) the model expects, falling back to the configured default."""
+        try:
+            return self.get().input_size
+        except ModelUnavailable:
+            return tuple(settings.CROP_MODEL_INPUT_SIZE)
+
+    def set(self, classifier):
+        """Install an already-built classifier (used by warm-up and offline fixtures)."""
+        with self._lock:
+            self._classifier = classifier
+
+    def reset(self):
+        with self._lock:
+            self._classifier = None
+
+    def warm_up(self):
+        """
+        Load the model and run one dummy forward pass so the first real
+        request does not pay for graph construction. Never raises.
+        """
+        try:
+            classifier = self.get()
+            width, height = classifier.input_size
+            classifier.predict_batch(np.zeros((1, height, width, 3), dtype=np.float32))
+            return True
+        except ModelUnavailable as exc:
+            logger.warning("Crop model not loaded: %s", exc)
+            return False
+        except Exception:
+            logger.exception("Crop model warm-up failed")
+            return False
+
+
+registry = ModelRegistry()
@@ -0,0 +1,197 @@
+"""
+Background detection jobs backed by the DetectionJob table.
+
+``/api/ai-detect/`` with ``async`` set stores the upload as a queued job and
+returns 202 straight away. ``python manage.py run_detection_worker`` runs one
+or more worker processes that claim queued jobs in batches, run them
+through the model in a single forward pass and write the history row and
+the response body back onto the job. No broker is needed: the database is
+the queue, so it works the same on SQLite and PostgreSQL.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics, tta
+from .catalogue import catalogue
+from .detection import detection_result
+from .inference import registry
+from .models import DetectionHistory, DetectionJob
+from .prefilter import check_crop
+from .preprocessing import load_image, ImageRejected
+from .timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+_waiters = threading.BoundedSemaphore(settings.CROP_JOB_MAX_WAITERS)
+
+
+def enqueue(user, upload, mode=DetectionJob.STANDARD):
+    """Store an already validated upload and queue it for a worker."""
+    return DetectionJob.objects.create(user=user, image=upload, mode=mode)
+
+
+def requeue_stale():
+    """Put back jobs whose worker died mid-run; give up after CROP_JOB_MAX_ATTEMPTS."""
+    cutoff = timezone.now() - timedelta(seconds=settings.CROP_JOB_STALE_AFTER)
+    stale = DetectionJob.objects.filter(status=DetectionJob.RUNNING, started_at__lt=cutoff)
+    stale.filter(attempts__gte=settings.CROP_JOB_MAX_ATTEMPTS).update(
+        status=DetectionJob.FAILED, error="Detection timed out", finished_at=timezone.now()
+    )
+    return stale.update(status=DetectionJob.QUEUED)
+
+
+def claim(limit):
+    """
+    Atomically take up to ``limit`` queued jobs. The conditional UPDATE
+    makes sure only one worker wins each job, without row locks.
+    """
+    claimed = []
+    candidates = DetectionJob.objects.filter(status=DetectionJob.QUEUED).order_by('id')
+    for job_id in candidates.values_list('id', flat=True)[:limit * 2]:
+        won = DetectionJob.objects.filter(id=job_id, status=DetectionJob.QUEUED).update(
+            status=DetectionJob.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if won:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return list(DetectionJob.objects.filter(id__in=claimed).order_by('id'))
+
+
+def _fail(job, message):
+    job.status = DetectionJob.FAILED
+    job.error = message
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+
+
+def process(jobs):
+    """
+    Decode, pre-filter and classify a batch of claimed jobs. Standard jobs
+    share one forward pass; tta jobs run their views (api/tta.py) each.
+    """
+    classifier = registry.get()
+    width, height = classifier.input_size
+    batch = np.empty((len(jobs), height, width, 3), dtype=np.float32)
+
+    timer = StageTimer()
+    ready = []
+    augmented = []
+    for job in jobs:
+        try:
+            with timer.stage('decode'), job.image.open('rb') as fh:
+                if job.mode == DetectionJob.TTA:
+                    prepared = load_image(fh, tta.decode_size(classifier.input_size))
+                else:
+                    prepared = load_image(fh, classifier.input_size, out=batch[len(ready)])
+            with timer.stage('prefilter'):
+                passed = check_crop(prepared.tensor).passed
+            if not passed:
+                _fail(job, "Please upload a valid crop image")
+                continue
+            if job.mode == DetectionJob.TTA:
+                augmented.append((job, prepared.image))
+            else:
+                ready.append(job)
+        except ImageRejected as e:
+            _fail(job, str(e))
+        except Exception as e:
+            _fail(job, f"Invalid image format: {str(e)}")
+
+    finished = []
+    if ready:
+        with timer.stage('inference'):
+            rows = classifier.predict_batch(batch[:len(ready)])
+        finished += [(job, classifier.decode(row), None) for job, row in zip(ready, rows)]
+    for job, image in augmented:
+        # Own timer: the view budget counts from this job, not the batch
+        job_timer = StageTimer()
+        prediction, views = tta.predict(image, job_timer)
+        metrics.record_stages('detection_worker', job_timer)
+        finished.append((job, prediction, views))
+
+    for job, prediction, views in finished:
+        with timer.stage('translation'):
+            disease = catalogue.get(prediction.label)
+            result = detection_result(prediction, disease)
+        result['mode'] = job.mode
+        if views is not None:
+            result['views'] = views
+        with timer.stage('save'):
+            detection = DetectionHistory.objects.create(
+                user_id=job.user_id,
+                image=job.image.name,
+                predicted_disease=disease,
+                confidence=prediction.confidence
+            )
+            result['detection_id'] = detection.id
+            result['detected_at'] = detection.detected_at
+
+            job.status = DetectionJob.DONE
+            job.detection = detection
+            job.result = json.loads(json.dumps(result, cls=DjangoJSONEncoder))
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'detection', 'result', 'finished_at'])
+
+    if not finished:
+        return
+    metrics.record_stages('detection_worker', timer)
+    if ready:
+        metrics.detections.inc(len(ready), endpoint='detection_worker', mode=DetectionJob.STANDARD)
+    if augmented:
+        metrics.detections.inc(len(augmented), endpoint='detection_worker', mode=DetectionJob.TTA)
+
+
+def run_worker(batch_size=None, poll_interval=None, stop=None):
+    """Claim and process jobs until ``stop()`` returns True."""
+    batch_size = batch_size or settings.CROP_BATCH_MAX_SIZE
+    poll_interval = poll_interval or settings.CROP_JOB_POLL_INTERVAL
+    registry.warm_up()
+    metrics.flusher.ensure_started()
+    last_sweep = 0.0
+    while not (stop and stop()):
+        if time.monotonic() - last_sweep > settings.CROP_JOB_STALE_AFTER / 2:
+            requeue_stale()
+            last_sweep = time.monotonic()
+
+        jobs = claim(batch_size)
+        if not jobs:
+            time.sleep(poll_interval)
+            continue
+        try:
+            process(jobs)
+        except Exception as e:
+            # Model missing or broken: fail this batch instead of spinning on it
+            logger.exception("Detection batch failed")
+            for job in jobs:
+                job.refresh_from_db(fields=['status'])
+                if not job.is_finished:
+                    _fail(job, f"Detection failed: {e}")
+
+
+def wait_for(job, timeout):
+    """
+    Long-poll: reload ``job`` until it finishes or ``timeout`` seconds pass
+    (at most CROP_JOB_MAX_WAIT). Each waiter holds a request thread, so when
+    CROP_JOB_MAX_WAITERS are already waiting the job is returned as it is.
+    """
+    if not _waiters.acquire(blocking=False):
+        return job
+    try:
+        deadline = time.monotonic() + min(timeout, settings.CROP_JOB_MAX_WAIT)
+        while not job.is_finished and time.monotonic() < deadline:
+            time.sleep(settings.CROP_JOB_POLL_INTERVAL)
+            job.refresh_from_db()
+        return job
+    finally:
+        _waiters.release()
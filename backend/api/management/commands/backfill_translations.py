@@ -0,0 +1,43 @@
+"""
+Fill the Kinyarwanda columns of existing Disease rows.
+
+    python manage.py backfill_translations          # only missing translations
+    python manage.py backfill_translations --force  # retranslate everything
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Disease
+from api.translator import translate_disease
+
+# Stored instead of a translation by earlier versions
+PLACEHOLDER_PREFIX = 'Translation for: '
+
+
+def missing(value):
+    return not value or value.startswith(PLACEHOLDER_PREFIX)
+
+
+class Command(BaseCommand):
+    help = "Precompute Kinyarwanda translations for Disease rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Retranslate fields that already have a value")
+
+    def handle(self, *args, **options):
+        updated = []
+        for disease in Disease.objects.all():
+            fields = [
+                field for field in Disease.TRANSLATED_FIELDS
+                if options['force'] or missing(getattr(disease, f'{field}_rw'))
+            ]
+            if fields:
+                updated.append(translate_disease(disease, fields))
+
+        # bulk_update skips auto_now; bump it so clients' cached catalogue is refreshed
+        now = timezone.now()
+        for disease in updated:
+            disease.updated_at = now
+        rw_fields = [f'{field}_rw' for field in Disease.TRANSLATED_FIELDS]
+        Disease.objects.bulk_update(updated, rw_fields + ['updated_at'])
+        self.stdout.write(self.style.SUCCESS(f"Translated {len(updated)} diseases"))
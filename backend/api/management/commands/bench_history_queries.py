@@ -0,0 +1,156 @@
+"""
+Benchmark the DetectionHistory query shapes used by api/views.py.
+
+Seeds synthetic users and detections (1M by default), then times each
+listing query with the history indexes dropped ("before") and restored
+("after"), printing the query plans and p50/p99 latencies.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python manage.py migrate
+    DATABASE_URL=sqlite:////tmp/bench.db python manage.py bench_history_queries --rows 1000000
+
+Run it against a scratch database: the seeded rows belong to users named
+``bench-user-*`` and are removed again with --cleanup.
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import Disease, DetectionHistory
+
+USER_PREFIX = 'bench-user-'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic history rows and benchmark listing queries before/after indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--skip-seed', action='store_true', help="Reuse rows from a previous run")
+        parser.add_argument('--skip-before', action='store_true', help="Only time the indexed queries")
+        parser.add_argument('--cleanup', action='store_true', help="Delete the seeded rows and exit")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['cleanup']:
+            self.cleanup(User)
+            return
+
+        if not options['skip_seed']:
+            self.seed(User, options['rows'], options['users'])
+
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).values_list('id', flat=True))
+        diseases = list(Disease.objects.values_list('id', flat=True))
+        if not users or not diseases:
+            self.stderr.write("No seeded rows found; run without --skip-seed first")
+            return
+
+        if not options['skip_before']:
+            self.stdout.write(self.style.MIGRATE_HEADING("\nBefore (history indexes dropped)"))
+            self.set_indexes(enabled=False)
+            try:
+                self.run_queries(users, diseases, options)
+            finally:
+                self.set_indexes(enabled=True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nAfter (history indexes present)"))
+        self.run_queries(users, diseases, options)
+
+    def seed(self, User, rows, user_count):
+        start = time.perf_counter()
+        existing = User.objects.filter(username__startswith=USER_PREFIX).count()
+        User.objects.bulk_create([
+            User(username=f'{USER_PREFIX}{i}', password='!')
+            for i in range(existing, user_count)
+        ], batch_size=1000)
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).values_list('id', flat=True))
+        diseases = list(Disease.objects.values_list('id', flat=True)) + [None]
+
+        # Raw inserts: bulk_create would overwrite detected_at (auto_now_add)
+        table = DetectionHistory._meta.db_table
+        sql = (
+            f'INSERT INTO {connection.ops.quote_name(table)} '
+            '(user_id, image, thumbnail, predicted_disease_id, confidence, detected_at) '
+            'VALUES (%s, %s, %s, %s, %s, %s)'
+        )
+        now = timezone.now()
+        rng = random.Random(0)
+        batch = 10_000
+        for offset in range(0, rows, batch):
+            params = [
+                (
+                    rng.choice(users),
+                    'detection_images/bench.jpg',
+                    '',
+                    rng.choice(diseases),
+                    round(rng.uniform(0.3, 1.0), 4),
+                    now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+                )
+                for _ in range(min(batch, rows - offset))
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+        self.stdout.write(f"Seeded {rows} rows for {len(users)} users in {time.perf_counter() - start:.1f} s")
+
+    def set_indexes(self, enabled):
+        with connection.schema_editor() as editor:
+            for index in DetectionHistory._meta.indexes:
+                if enabled:
+                    editor.add_index(DetectionHistory, index)
+                else:
+                    editor.remove_index(DetectionHistory, index)
+
+    def query_shapes(self, users, diseases, page_size):
+        """The querysets DetectionHistoryViewSet.list issues, one page deep."""
+        base = DetectionHistory.objects.select_related('user', 'predicted_disease').order_by('-detected_at', '-id')
+        middle = timezone.now() - timedelta(days=180)
+        return {
+            'farmer: own history': lambda: base.filter(user_id=random.choice(users))[:page_size + 1],
+            'farmer: next page': lambda: base.filter(user_id=random.choice(users), detected_at__lt=middle)[:page_size + 1],
+            'expert: all history': lambda: base[:page_size + 1],
+            'expert: next page': lambda: base.filter(detected_at__lt=middle)[:page_size + 1],
+            'expert: by disease': lambda: base.filter(predicted_disease_id=random.choice(diseases))[:page_size + 1],
+        }
+
+    def run_queries(self, users, diseases, options):
+        for name, make_query in self.query_shapes(users, diseases, options['page_size']).items():
+            self.stdout.write(f"\n{name}")
+            self.stdout.write("  plan: " + make_query().explain().replace('\n', '\n        '))
+            timings = []
+            for _ in range(options['iterations']):
+                query = make_query()
+                start = time.perf_counter()
+                list(query)
+                timings.append((time.perf_counter() - start) * 1000.0)
+            self.stdout.write(
+                f"  p50 {percentile(timings, 50):.2f} ms  p99 {percentile(timings, 99):.2f} ms  "
+                f"mean {statistics.mean(timings):.2f} ms"
+            )
+
+    def cleanup(self, User):
+        history = connection.ops.quote_name(DetectionHistory._meta.db_table)
+        user_table = connection.ops.quote_name(User._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Raw delete: the ORM would load a million rows to cascade
+            cursor.execute(
+                f'DELETE FROM {history} WHERE user_id IN '
+                f'(SELECT id FROM {user_table} WHERE username LIKE %s)',
+                [USER_PREFIX + '%']
+            )
+            deleted = cursor.rowcount
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+        self.stdout.write(f"Deleted {deleted} seeded rows")
@@ -0,0 +1,487 @@
+"""
+Reproducible load benchmark for the detection API.
+
+Starts gunicorn (gunicorn.conf.py) on a scratch SQLite database and media
+directory, registers one user per client through /api/auth/register/ for
+their JWTs, and drives /api/ai-detect/, /api/history/ and /api/diseases/
+(and optionally /api/auth/login/ and /api/auth/register/) with
+--concurrency clients. Detection uploads are synthetic leaf images at
+each of --sizes, each with a unique JPEG comment so that no request is
+answered from the upload cache.
+
+The command reports throughput, p50/p95/p99 latency and the RSS of the
+gunicorn master and each worker, and writes everything to --output as JSON.
+Given --baseline (an earlier --output), it prints the change per endpoint and
+exits non-zero if latency, throughput, errors or memory regressed by more
+than --tolerance. Compare runs made on the same machine and settings.
+
+    python manage.py build_tiny_model          # or set CROP_MODEL_PATH
+    python manage.py benchmark_api --output bench/baseline.json
+    python manage.py benchmark_api --baseline bench/baseline.json --output bench/latest.json
+
+    # Logins and sign-ups per second with another password hasher:
+    CROP_PASSWORD_HASHER=scrypt python manage.py benchmark_api --endpoints login,register
+
+    # An already running deployment (no RSS figures):
+    python manage.py benchmark_api --url http://localhost:8000 --endpoints history,diseases
+"""
+import http.client
+import itertools
+import json
+import os
+import platform
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .loadtest_uploads import leaf_jpeg, multipart_body, percentile
+
+ENDPOINTS = {
+    'detect': ('POST', '/api/ai-detect/'),
+    'history': ('GET', '/api/history/'),
+    'diseases': ('GET', '/api/diseases/'),
+    'login': ('POST', '/api/auth/login/'),
+    'register': ('POST', '/api/auth/register/'),
+}
+
+# README: "Fast AI processing (<10s per image)"
+DETECT_SLO_MS = 10_000.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def tagged(jpeg, tag):
+    """The same picture with different bytes (and SHA-256): a JPEG comment after the JFIF header."""
+    comment = tag.encode()
+    segment = b'\xff\xfe' + struct.pack('>H', len(comment) + 2) + comment
+    offset = 2
+    if jpeg[2:4] == b'\xff\xe0':
+        offset = 4 + struct.unpack('>H', jpeg[4:6])[0]
+    return jpeg[:offset] + segment + jpeg[offset:]
+
+
+def call(base, method, path, token=None, body=None, content_type=None, timeout=120.0):
+    """One request on a fresh connection; returns (status, body bytes)."""
+    conn_class = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+    conn = conn_class(base.hostname, base.port, timeout=timeout)
+    headers = {}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    if content_type:
+        headers['Content-Type'] = content_type
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+# Memory
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(parent):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as fh:
+                # "pid (comm) state ppid ..."; comm may contain spaces
+                fields = fh.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == parent:
+            children.append(int(entry))
+    return children
+
+
+class RssSampler(threading.Thread):
+    """Samples the RSS of the gunicorn master and its workers (Linux /proc only)."""
+
+    def __init__(self, master_pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.samples = {}
+        self._done = threading.Event()
+
+    def sample(self):
+        for pid in [self.master_pid] + child_pids(self.master_pid):
+            value = rss_mb(pid)
+            if value is None:
+                continue
+            entry = self.samples.setdefault(pid, {
+                'pid': pid, 'role': 'master' if pid == self.master_pid else 'worker',
+                'rss_mb_start': value, 'rss_mb_peak': value,
+            })
+            entry['rss_mb_peak'] = max(entry['rss_mb_peak'], value)
+            entry['rss_mb_end'] = value
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.sample()
+        return [
+            {key: round(value, 1) if isinstance(value, float) else value for key, value in entry.items()}
+            for entry in sorted(self.samples.values(), key=lambda e: (e['role'] != 'master', e['pid']))
+        ]
+
+
+# Server
+
+class Server:
+    """gunicorn on a scratch database and media directory under ``workdir``."""
+
+    def __init__(self, workdir, workers, threads, startup_timeout):
+        self.workdir = workdir
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.startup_timeout = startup_timeout
+        self.env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.sqlite3')}",
+            MEDIA_ROOT=os.path.join(workdir, 'media'),
+            CROP_METRICS_DIR=os.path.join(workdir, 'metrics'),
+            DEBUG='False',
+            SECURE_SSL_REDIRECT='False',
+            PORT=str(self.port),
+            WEB_CONCURRENCY=str(workers),
+            GUNICORN_THREADS=str(threads),
+        )
+        self.process = None
+        self.log = None
+
+    def start(self):
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '--noinput', '-v0'],
+            cwd=settings.BASE_DIR, env=self.env, check=True,
+        )
+        self.log = open(os.path.join(self.workdir, 'server.log'), 'wb')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'cropdetector.wsgi:application', '--bind', f'127.0.0.1:{self.port}'],
+            cwd=settings.BASE_DIR, env=self.env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                with open(self.log.name, 'rb') as fh:
+                    tail = fh.read()[-2000:].decode(errors='replace')
+                raise CommandError(f"gunicorn exited during start-up:\n{tail}")
+            try:
+                if call(urlparse(self.url), 'GET', '/health/', timeout=2.0)[0] == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f"gunicorn did not answer /health/ within {self.startup_timeout:.0f} s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.log is not None:
+            self.log.close()
+
+
+# Load
+
+def summarize(samples, wall_s):
+    statuses = {}
+    for status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [ms for status, ms in samples if isinstance(status, int) and status < 400]
+    latencies = ok or [ms for _, ms in samples]
+    return {
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'statuses': statuses,
+        'wall_s': round(wall_s, 3),
+        'throughput_rps': round(len(ok) / wall_s, 2) if wall_s else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2) if latencies else None,
+        },
+    }
+
+
+def run_load(base, clients, total, make_request, timeout):
+    """Send ``total`` requests from len(clients) concurrent clients; returns [(status, ms, tag)]."""
+    counter = itertools.count()
+    samples = []
+    lock = threading.Lock()
+
+    def client(user):
+        while True:
+            index = next(counter)
+            if index >= total:
+                return
+            method, path, token, body, content_type, tag = make_request(index, user)
+            start = time.perf_counter()
+            try:
+                status = call(base, method, path, token, body, content_type, timeout)[0]
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000.0
+            with lock:
+                samples.append((status, elapsed, tag))
+
+    threads = [threading.Thread(target=client, args=(user,)) for user in clients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+# Baseline comparison
+
+def compare(baseline, current, tolerance):
+    """Rows of (endpoint, metric, before, after, change, regressed)."""
+    rows = []
+
+    def row(endpoint, metric, before, after, higher_is_worse, gate=True):
+        if before in (None, 0) or after is None:
+            return
+        change = (after - before) / before
+        worse = change > tolerance if higher_is_worse else change < -tolerance
+        rows.append((endpoint, metric, before, after, change, gate and worse))
+
+    for name, after in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        # p50 is shown but too noisy on short runs to fail on
+        for pct in ('p50', 'p95', 'p99'):
+            row(name, f'{pct} ms', before['latency_ms'][pct], after['latency_ms'][pct], True, gate=pct != 'p50')
+        row(name, 'req/s', before['throughput_rps'], after['throughput_rps'], False)
+        if after['errors'] > before['errors']:
+            rows.append((name, 'errors', before['errors'], after['errors'], None, True))
+
+    def peak(result):
+        workers = [w['rss_mb_peak'] for w in result.get('workers', []) if w['role'] == 'worker']
+        return max(workers) if workers else None
+
+    row('workers', 'peak RSS MB', peak(baseline), peak(current), True)
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Benchmark detect/history/diseases under concurrent load and compare with a JSON baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Benchmark this running server instead of starting one")
+        parser.add_argument('--endpoints', default='detect,history,diseases')
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients, one user each")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint")
+        parser.add_argument('--warmup', type=int, default=10, help="Unrecorded requests per endpoint")
+        parser.add_argument('--sizes', default='640x480,1280x960,4032x3024', help="Upload sizes, WxH")
+        parser.add_argument('--workers', type=int, default=2, help="gunicorn workers when starting a server")
+        parser.add_argument('--threads', type=int, default=4, help="gunicorn threads per worker")
+        parser.add_argument('--timeout', type=float, default=120.0, help="Per-request timeout in seconds")
+        parser.add_argument('--startup-timeout', type=float, default=120.0)
+        parser.add_argument('--output', help="Write the results here as JSON")
+        parser.add_argument('--baseline', help="Earlier --output to compare against")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+        parser.add_argument('--keep', action='store_true', help="Keep the scratch directory and server log")
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))} (choose from {', '.join(ENDPOINTS)})")
+        try:
+            sizes = [tuple(int(n) for n in size.lower().split('x')) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes must look like 640x480,1280x960")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+
+        workdir = tempfile.mkdtemp(prefix='crop-bench-')
+        server = sampler = None
+        try:
+            if options['url']:
+                base_url = options['url'].rstrip('/')
+            else:
+                self.stdout.write(f"Starting gunicorn ({options['workers']} workers) in {workdir} ...")
+                server = Server(workdir, options['workers'], options['threads'], options['startup_timeout'])
+                server.start()
+                base_url = server.url
+                if sys.platform.startswith('linux'):
+                    sampler = RssSampler(server.process.pid)
+                    sampler.sample()
+                    sampler.start()
+            results = self.run(urlparse(base_url), endpoints, sizes, options)
+            results['workers'] = sampler.stop() if sampler else []
+            sampler = None
+        finally:
+            if sampler is not None:
+                sampler.stop()
+            if server is not None:
+                server.stop()
+            if options['keep']:
+                self.stdout.write(f"Scratch directory kept: {workdir}")
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        self.report(results)
+        if options['output']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline is not None:
+            self.check_baseline(baseline, results, options['tolerance'])
+
+    def run(self, base, endpoints, sizes, options):
+        # One registered user (and JWT) per client; usernames are unique per run
+        run_id = uuid.uuid4().hex[:8]
+        clients = []
+        for index in range(options['concurrency']):
+            credentials = json.dumps({'username': f'bench-{run_id}-{index}', 'password': uuid.uuid4().hex})
+            status, body = call(base, 'POST', '/api/auth/register/', body=credentials, content_type='application/json')
+            if status != 201:
+                raise CommandError(f"Registering a benchmark user failed ({status}): {body[:300]!r}")
+            clients.append({'token': json.loads(body)['access'], 'credentials': credentials})
+
+        images = [(f'{width}x{height}', leaf_jpeg(width, height, seed)) for seed, (width, height) in enumerate(sizes)]
+
+        def make_request(name):
+            method, path = ENDPOINTS[name]
+            if name == 'login':
+                return lambda index, user: (method, path, None, user['credentials'], 'application/json', None)
+            if name == 'register':
+                def register(index, user):
+                    # Warm-up and measured runs both count from 0, so not the index
+                    body = json.dumps({'username': f'bench-{uuid.uuid4().hex[:16]}', 'password': uuid.uuid4().hex})
+                    return method, path, None, body, 'application/json', None
+                return register
+            if name != 'detect':
+                return lambda index, user: (method, path, user['token'], None, None, None)
+
+            def detect(index, user):
+                label, jpeg = images[index % len(images)]
+                content_type, body = multipart_body('image', f'leaf-{index}.jpg', tagged(jpeg, f'{run_id}-{index}'))
+                return method, path, user['token'], body, content_type, label
+            return detect
+
+        results = {
+            'version': 1,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_commit': self.git_commit(),
+            'host': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'config': {
+                'url': options['url'] or 'gunicorn (scratch SQLite)',
+                'workers': None if options['url'] else options['workers'],
+                'threads': None if options['url'] else options['threads'],
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'sizes': [label for label, _ in images],
+                'model_backend': settings.CROP_MODEL_BACKEND,
+                'password_hasher': settings.CROP_PASSWORD_HASHER,
+            },
+            'endpoints': {},
+        }
+        for name in endpoints:
+            # Warm-up: model load after fork, catalogue, connections
+            if options['warmup']:
+                run_load(base, clients, options['warmup'], make_request(name), options['timeout'])
+            self.stdout.write(f"{name}: {options['requests']} requests from {len(clients)} clients ...")
+            samples, wall_s = run_load(base, clients, options['requests'], make_request(name), options['timeout'])
+            summary = summarize([(status, ms) for status, ms, _ in samples], wall_s)
+            if name == 'detect':
+                summary['by_size'] = {
+                    label: summarize([(status, ms) for status, ms, tag in samples if tag == label], wall_s)['latency_ms']
+                    for label, _ in images
+                }
+                summary['within_slo'] = summary['errors'] == 0 and summary['latency_ms']['p99'] <= DETECT_SLO_MS
+            results['endpoints'][name] = summary
+        return results
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, results):
+        self.stdout.write("")
+        self.stdout.write(f"{'endpoint':<10} {'req':>6} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, summary in results['endpoints'].items():
+            latency = summary['latency_ms']
+            self.stdout.write(
+                f"{name:<10} {summary['requests']:>6} {summary['errors']:>5} {summary['throughput_rps']:>8.1f} "
+                f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f}"
+            )
+            if summary['errors']:
+                self.stdout.write(f"           statuses: {summary['statuses']}")
+        detect = results['endpoints'].get('detect')
+        if detect:
+            for label, latency in detect['by_size'].items():
+                self.stdout.write(f"  detect {label:<11} p50 {latency['p50']:.1f} ms  p99 {latency['p99']:.1f} ms")
+            verdict = "within" if detect['within_slo'] else "NOT within"
+            self.stdout.write(f"  detect p99 is {verdict} the {DETECT_SLO_MS / 1000:.0f} s per image target")
+        for worker in results['workers']:
+            self.stdout.write(
+                f"{worker['role']:<7} pid {worker['pid']:<8} RSS start {worker['rss_mb_start']:.1f} MB  "
+                f"peak {worker['rss_mb_peak']:.1f} MB  end {worker['rss_mb_end']:.1f} MB"
+            )
+
+    def check_baseline(self, baseline, results, tolerance):
+        if baseline.get('config') != results['config']:
+            self.stdout.write(self.style.WARNING("Baseline was recorded with a different configuration"))
+        rows = compare(baseline, results, tolerance)
+        self.stdout.write(f"\nAgainst baseline {baseline.get('git_commit') or ''} ({baseline.get('created_at')}):")
+        for endpoint, metric, before, after, change, regressed in rows:
+            delta = f"{change:+.1%}" if change is not None else ""
+            line = f"  {endpoint:<10} {metric:<12} {before:>10} -> {after:<10} {delta}"
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+        regressions = [row for row in rows if row[-1]]
+        if regressions:
+            raise CommandError(f"{len(regressions)} metric(s) regressed by more than {tolerance:.0%}")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,55 @@
+"""
+Build a tiny, untrained Keras classifier for offline development and tests.
+
+    python manage.py build_tiny_model
+    python manage.py build_tiny_model --output /tmp/tiny.keras --labels /tmp/labels.json
+
+The labels default to the current Disease names plus "Healthy", so the
+detection endpoint can be exercised end-to-end without the real weights.
+"""
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Disease
+
+
+class Command(BaseCommand):
+    help = "Write a tiny Keras model and labels file for offline testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.CROP_MODEL_PATH)
+        parser.add_argument('--labels', default=settings.CROP_MODEL_LABELS)
+        parser.add_argument('--size', type=int, default=32, help="Square input size in pixels")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            import tensorflow as tf
+        except ImportError:
+            raise CommandError("TensorFlow is required to build the model")
+
+        labels = list(Disease.objects.order_by('id').values_list('name', flat=True))
+        labels.append('Healthy')
+
+        tf.random.set_seed(options['seed'])
+        size = options['size']
+        model = tf.keras.Sequential([
+            tf.keras.layers.Input(shape=(size, size, 3)),
+            tf.keras.layers.Conv2D(4, 3, activation='relu'),
+            tf.keras.layers.GlobalAveragePooling2D(),
+            tf.keras.layers.Dense(len(labels), activation='softmax'),
+        ])
+
+        for path in (options['output'], options['labels']):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        model.save(options['output'])
+        with open(options['labels'], 'w', encoding='utf-8') as fh:
+            json.dump(labels, fh, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {len(labels)}-class model to {options['output']} "
+            f"and labels to {options['labels']}"
+        ))
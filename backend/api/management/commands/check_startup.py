@@ -0,0 +1,92 @@
+"""
+Cold-start import budget check.
+
+Runs ``python -X importtime`` in fresh interpreters that set up Django and
+load the URLconf, which is what every management command's system checks
+and every worker's first request do. It then reports where the time goes.
+The command exits non-zero if the median import time exceeds the budget,
+or if a heavy module that should only load on first use (TensorFlow,
+NumPy, Pillow, ...) is imported.
+
+    python manage.py check_startup
+    python manage.py check_startup --budget-ms 400 --runs 7 --top 20
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Must not be imported just to load settings, models and URLs
+LAZY_MODULES = (
+    'tensorflow', 'keras', 'onnxruntime', 'tflite_runtime', 'cv2',
+    'numpy', 'PIL', 'deep_translator', 'boto3', 'storages',
+)
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure(code):
+    """Return {module: (self_us, cumulative_us, depth)} for one cold run of ``code``."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'cropdetector.settings'))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise CommandError(f"Startup failed:\n{completed.stderr[-2000:]}")
+    modules = {}
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Measure cold import time of Django setup + URLconf and fail if it regresses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=float, default=600.0,
+                            help="Maximum median import time in milliseconds")
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help="Slowest top-level imports to list")
+
+    def handle(self, *args, **options):
+        code = (
+            "import django; django.setup(); "
+            f"import importlib; importlib.import_module({settings.ROOT_URLCONF!r})"
+        )
+        runs = [measure(code) for _ in range(options['runs'])]
+        totals = [sum(self_us for self_us, _, _ in run.values()) / 1000.0 for run in runs]
+        median = statistics.median(totals)
+
+        last = runs[-1]
+        top_level = sorted(
+            ((cumulative, name) for name, (_, cumulative, depth) in last.items() if depth == 0),
+            reverse=True,
+        )[:options['top']]
+        self.stdout.write("Slowest top-level imports (last run):")
+        for cumulative, name in top_level:
+            self.stdout.write(f"  {cumulative / 1000.0:8.1f} ms  {name}")
+        self.stdout.write(
+            f"Import time over {len(runs)} runs: median {median:.1f} ms, "
+            f"min {min(totals):.1f} ms, max {max(totals):.1f} ms (budget {options['budget_ms']:.0f} ms)"
+        )
+
+        problems = []
+        eager = sorted({
+            name.split('.')[0] for name in last
+            if name.split('.')[0] in LAZY_MODULES
+        })
+        if eager:
+            problems.append(f"heavy modules imported at startup: {', '.join(eager)}")
+        if median > options['budget_ms']:
+            problems.append(f"median {median:.1f} ms exceeds the {options['budget_ms']:.0f} ms budget")
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("Startup import budget OK"))
@@ -0,0 +1,181 @@
+"""
+Export the trained Keras model for the lightweight inference backends.
+
+    python manage.py export_model --format tflite --quantize int8
+    python manage.py export_model --format onnx --quantize int8 --calibration-dir photos/
+
+int8 quantization calibrates activation ranges on real images: those in
+--calibration-dir, or else the most recent stored detection uploads. The
+labels file is shared with the Keras model. Serve the result with
+CROP_MODEL_BACKEND=tflite (or onnx) and CROP_MODEL_PATH pointing at it.
+
+Needs TensorFlow, plus tf2onnx and onnxruntime for --format onnx.
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.inference import MODEL_LOADERS, load_keras_model, _input_size, ModelUnavailable
+from api.models import DetectionHistory
+from api.preprocessing import load_image
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+
+class Command(BaseCommand):
+    help = "Convert the Keras crop model to ONNX or TFLite, optionally int8-quantized"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['onnx', 'tflite'], default='tflite')
+        parser.add_argument('--quantize', choices=['none', 'dynamic', 'int8'], default='int8',
+                            help="dynamic: int8 weights only; int8: weights and activations (calibrated)")
+        parser.add_argument('--model', default=None, help="Keras model (default: CROP_MODEL_PATH when CROP_MODEL_BACKEND is keras)")
+        parser.add_argument('--output', default=None)
+        parser.add_argument('--calibration-dir', default=None, help="Directory of representative crop photos")
+        parser.add_argument('--calibration-samples', type=int, default=200)
+
+    def handle(self, *args, **options):
+        source = options['model']
+        if source is None:
+            if settings.CROP_MODEL_BACKEND != 'keras':
+                raise CommandError(
+                    f"CROP_MODEL_PATH is the {settings.CROP_MODEL_BACKEND} model; pass the Keras one with --model"
+                )
+            source = settings.CROP_MODEL_PATH
+        output = options['output'] or str(Path(source).with_suffix(f".{options['format']}"))
+        try:
+            model = load_keras_model(source)
+        except ModelUnavailable as e:
+            raise CommandError(str(e))
+        except Exception as e:
+            raise CommandError(f"Could not load {source}: {e}")
+        input_size = _input_size(model)
+
+        calibration = None
+        if options['quantize'] == 'int8':
+            calibration = self.calibration_batches(input_size, options)
+
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        if options['format'] == 'tflite':
+            self.export_tflite(model, output, options['quantize'], calibration)
+        else:
+            self.export_onnx(model, output, options['quantize'], calibration)
+
+        self.compare(model, output, options['format'], input_size, calibration)
+
+    def calibration_batches(self, input_size, options):
+        """Up to --calibration-samples preprocessed images, as (1, H, W, 3) arrays."""
+        limit = options['calibration_samples']
+        samples = []
+        if options['calibration_dir']:
+            paths = sorted(
+                path for path in Path(options['calibration_dir']).rglob('*')
+                if path.suffix.lower() in IMAGE_SUFFIXES
+            )[:limit]
+            for path in paths:
+                with open(path, 'rb') as fh:
+                    samples.append(self.prepare(fh, input_size, path))
+        else:
+            recent = DetectionHistory.objects.order_by('-detected_at').values_list('image', flat=True)
+            names = list(dict.fromkeys(recent[:limit * 2]))[:limit]  # uploads may be shared
+            for name in names:
+                try:
+                    with DetectionHistory._meta.get_field('image').storage.open(name, 'rb') as fh:
+                        samples.append(self.prepare(fh, input_size, name))
+                except FileNotFoundError:
+                    continue
+
+        samples = [sample for sample in samples if sample is not None]
+        if not samples:
+            raise CommandError(
+                "int8 quantization needs calibration images: pass --calibration-dir "
+                "or run some detections first (or use --quantize dynamic)"
+            )
+        self.stdout.write(f"Calibrating on {len(samples)} images")
+        return samples
+
+    def prepare(self, fh, input_size, label):
+        try:
+            return load_image(fh, input_size).tensor[np.newaxis, ...]
+        except Exception as e:
+            self.stderr.write(f"Skipping {label}: {e}")
+            return None
+
+    def export_tflite(self, model, output, quantize, calibration):
+        import tensorflow as tf
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        if quantize != 'none':
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantize == 'int8':
+            converter.representative_dataset = lambda: ([sample] for sample in calibration)
+            # Integer kernels throughout; input and output stay float32 so the
+            # serving code does not change
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        with open(output, 'wb') as fh:
+            fh.write(converter.convert())
+
+    def export_onnx(self, model, output, quantize, calibration):
+        try:
+            import tensorflow as tf
+            import tf2onnx
+        except ImportError:
+            raise CommandError("tf2onnx is required for --format onnx")
+
+        height_width = model.input_shape[1:3]
+        spec = (tf.TensorSpec((None, *height_width, 3), tf.float32, name='image'),)
+        if quantize == 'none':
+            tf2onnx.convert.from_keras(model, input_signature=spec, output_path=output)
+            return
+
+        from onnxruntime.quantization import (
+            CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static,
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            float_path = os.path.join(tmp, 'float.onnx')
+            tf2onnx.convert.from_keras(model, input_signature=spec, output_path=float_path)
+            if quantize == 'dynamic':
+                quantize_dynamic(float_path, output, weight_type=QuantType.QInt8)
+                return
+
+            class Reader(CalibrationDataReader):
+                def __init__(self):
+                    self.samples = iter(calibration)
+
+                def get_next(self):
+                    sample = next(self.samples, None)
+                    return None if sample is None else {'image': sample}
+
+            quantize_static(
+                float_path, output, Reader(),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+            )
+
+    def compare(self, model, output, backend, input_size, calibration):
+        """Report size, latency and top-1 agreement of the export against Keras."""
+        exported = MODEL_LOADERS[backend](output)
+        width, height = input_size
+        samples = calibration or [np.random.default_rng(0).random((1, height, width, 3), dtype=np.float32)]
+
+        def timed(run):
+            start = time.perf_counter()
+            results = [np.asarray(run(sample)) for sample in samples]
+            return results, (time.perf_counter() - start) * 1000.0 / len(samples)
+
+        reference, keras_ms = timed(lambda sample: model(sample, training=False).numpy())
+        converted, export_ms = timed(exported)
+        agreement = np.mean([
+            np.argmax(a, axis=-1)[0] == np.argmax(b, axis=-1)[0] for a, b in zip(reference, converted)
+        ])
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output} ({os.path.getsize(output) / 1e6:.2f} MB)"))
+        self.stdout.write(f"Latency per image: keras {keras_ms:.2f} ms, {backend} {export_ms:.2f} ms")
+        self.stdout.write(f"Top-1 agreement with keras: {agreement:.1%} on {len(samples)} images")
@@ -0,0 +1,28 @@
+"""
+Recompute the analytics rollup tables from DetectionHistory.
+
+The rollups are kept up to date on every save and delete; run this once
+after migrating an existing database, or after rows were inserted or
+deleted with raw SQL (e.g. by bench_history_queries).
+
+    python manage.py rebuild_rollups
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import analytics
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily and per-user detection rollups from the history table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        processed = analytics.rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups from {processed} detections in {time.perf_counter() - start:.1f} s"
+        ))
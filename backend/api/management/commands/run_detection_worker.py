@@ -0,0 +1,59 @@
+"""
+Run background detection workers for async /api/ai-detect/ jobs.
+
+    python manage.py run_detection_worker --processes 2
+
+Each process loads the model once and claims queued DetectionJob rows in
+batches; throughput scales with --processes, independently of the number
+of gunicorn threads.
+"""
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import run_worker
+
+
+def _worker(batch_size, poll_interval):
+    # Finish the current batch, then exit
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stopping.append(True))
+    run_worker(batch_size=batch_size, poll_interval=poll_interval, stop=lambda: bool(stopping))
+
+
+class Command(BaseCommand):
+    help = "Process queued detection jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--poll-interval', type=float, default=None, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        args = (options['batch_size'], options['poll_interval'])
+        if options['processes'] <= 1:
+            self.stdout.write("Detection worker started")
+            _worker(*args)
+            return
+
+        # Children must open their own database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_worker, args=args, name=f'detection-worker-{i}')
+            for i in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} detection workers")
+
+        def terminate(*_):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, terminate)
+        signal.signal(signal.SIGINT, terminate)
+        for process in processes:
+            process.join()
@@ -0,0 +1,284 @@
+"""
+In-process metrics with a Prometheus text endpoint at ``/metrics``.
+
+Recording is a dict update under a lock, cheap enough for the hot path.
+Each gunicorn worker (and detection worker) keeps its own counters. When
+CROP_METRICS_DIR is set (gunicorn.conf.py does this), every process
+writes a snapshot there every CROP_METRICS_FLUSH_INTERVAL seconds.
+``/metrics`` then merges those snapshots: counters and histograms summed
+over all processes, gauges over the live ones. A scrape therefore covers
+the whole server rather than whichever worker answered.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        return json.dumps([str(labels[name]) for name in self.labelnames])
+
+    def snapshot(self):
+        with self._lock:
+            values = {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+        return {'kind': self.kind, 'help': self.documentation, 'labels': self.labelnames, 'values': values}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [count per bucket..., +Inf count, sum]
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[index] += 1
+            row[-2] += 1
+            row[-1] += value
+
+    def snapshot(self):
+        return dict(super().snapshot(), buckets=self.buckets)
+
+
+REGISTRY = {}
+
+stage_seconds = Histogram(
+    'crop_stage_seconds', "Time spent in each stage of a detection request",
+    ('endpoint', 'stage'),
+)
+request_seconds = Histogram(
+    'crop_request_seconds', "Request latency including response rendering",
+    ('route', 'method', 'status'),
+)
+request_queries = Histogram(
+    'crop_request_db_queries', "Database queries executed per request",
+    ('route',), buckets=COUNT_BUCKETS,
+)
+detections = Counter('crop_detections_total', "Completed detections", ('endpoint', 'mode'))
+
+
+def record_stages(endpoint, timer):
+    """Feed a StageTimer (api/timing.py) into crop_stage_seconds."""
+    for stage, ms in timer.stages.items():
+        stage_seconds.observe(ms / 1000.0, endpoint=endpoint, stage=stage)
+
+
+def process_gauges():
+    """
+    Per-process state owned by other modules, read without importing them:
+    a module this process never loaded has nothing to report.
+    """
+    gauges = {}
+    dedup = sys.modules.get('api.dedup')
+    if dedup is not None:
+        stats = dedup.cache.stats()
+        gauges['crop_dedup_cache_hits_total'] = ('counter', "Upload cache hits", stats['hits'])
+        gauges['crop_dedup_cache_misses_total'] = ('counter', "Upload cache misses", stats['misses'])
+        gauges['crop_dedup_cache_evictions_total'] = ('counter', "Upload cache evictions", stats['evictions'])
+        gauges['crop_dedup_cache_entries'] = ('gauge', "Entries in the upload cache", stats['size'])
+    authentication = sys.modules.get('api.authentication')
+    if authentication is not None:
+        stats = authentication.users.stats()
+        gauges['crop_auth_user_cache_hits_total'] = ('counter', "Requests authenticated without a user query", stats['hits'])
+        gauges['crop_auth_user_cache_misses_total'] = ('counter', "Requests that loaded the user", stats['misses'])
+    prefilter = sys.modules.get('api.prefilter')
+    if prefilter is not None:
+        stats = prefilter.stats.snapshot()
+        gauges['crop_prefilter_checked_total'] = ('counter', "Images run through the pre-filter", stats['checked'])
+        gauges['crop_prefilter_rejected_total'] = ('counter', "Images rejected by the pre-filter", stats['rejected'])
+    batching = sys.modules.get('api.batching')
+    if batching is not None:
+        gauges['crop_batch_queue_depth'] = ('gauge', "Images waiting for the next batched forward pass",
+                                            batching.scheduler.pending())
+    async_views = sys.modules.get('api.async_views')
+    if async_views is not None:
+        gauges['crop_async_executor_queue_depth'] = ('gauge', "Tasks waiting for the async views' thread pool",
+                                                     async_views.executor._work_queue.qsize())
+    return gauges
+
+
+def snapshot():
+    metrics = {name: metric.snapshot() for name, metric in REGISTRY.items()}
+    for name, (kind, documentation, value) in process_gauges().items():
+        metrics[name] = {'kind': kind, 'help': documentation, 'labels': (), 'values': {'[]': value}}
+    return {'pid': os.getpid(), 'written_at': time.time(), 'metrics': metrics}
+
+
+# Sharing between processes
+
+class Flusher:
+    """Writes this process's snapshot to CROP_METRICS_DIR periodically (one thread per pid)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        if not settings.CROP_METRICS_DIR or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='crop-metrics', daemon=True).start()
+                atexit.register(self.flush)
+
+    def path(self, pid=None):
+        return os.path.join(settings.CROP_METRICS_DIR, f"{pid or os.getpid()}.json")
+
+    def flush(self):
+        os.makedirs(settings.CROP_METRICS_DIR, exist_ok=True)
+        partial = self.path() + '.tmp'
+        with open(partial, 'w', encoding='utf-8') as fh:
+            json.dump(snapshot(), fh)
+        os.replace(partial, self.path())
+
+    def _run(self):
+        while True:
+            time.sleep(settings.CROP_METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+
+flusher = Flusher()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def collect():
+    """This process's snapshot merged with those the other processes wrote."""
+    snapshots = [snapshot()]
+    directory = settings.CROP_METRICS_DIR
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == f"{os.getpid()}.json":
+                continue
+            try:
+                with open(os.path.join(directory, filename), encoding='utf-8') as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+
+    merged = {}
+    for snap in snapshots:
+        live = snap['pid'] == os.getpid() or _alive(snap['pid'])
+        for name, metric in snap['metrics'].items():
+            if metric['kind'] == 'gauge' and not live:
+                continue
+            target = merged.setdefault(name, dict(metric, values={}))
+            for key, value in metric['values'].items():
+                if key not in target['values']:
+                    target['values'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['values'][key] = [a + b for a, b in zip(target['values'][key], value)]
+                else:
+                    target['values'][key] += value
+    return merged
+
+
+# Exposition
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render(merged, extra_gauges=()):
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for key, value in sorted(metric['values'].items()):
+            label_values = json.loads(key)
+            if metric['kind'] != 'histogram':
+                lines.append(f"{name}{_labels(metric['labels'], label_values)} {value}")
+                continue
+            for bound, count in zip(metric['buckets'], value):
+                lines.append(f"{name}_bucket{_labels(metric['labels'], label_values, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_labels(metric['labels'], label_values, [('le', '+Inf')])} {value[-2]}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], label_values)} {value[-1]}")
+            lines.append(f"{name}_count{_labels(metric['labels'], label_values)} {value[-2]}")
+    for name, documentation, labelname, values in extra_gauges:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        for label, value in values.items():
+            lines.append(f'{name}{{{labelname}="{_escape(label)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def job_queue_depths():
+    """Queued and running DetectionJob rows: one GROUP BY on the indexed status column."""
+    from django.db.models import Count
+    from .models import DetectionJob
+
+    counts = {DetectionJob.QUEUED: 0, DetectionJob.RUNNING: 0}
+    rows = (
+        DetectionJob.objects.filter(status__in=counts).values_list('status')
+        .annotate(n=Count('id')).order_by()
+    )
+    counts.update(dict(rows))
+    return counts
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, limited to CROP_METRICS_ALLOWED_IPS."""
+    if not settings.CROP_METRICS_ENABLED:
+        raise Http404("Metrics are disabled")
+    if request.META.get('REMOTE_ADDR') not in settings.CROP_METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden("Metrics are only served to allowed addresses\n")
+    extra = [(
+        'crop_detection_jobs', "Detection jobs waiting or running, by status",
+        'status', job_queue_depths(),
+    )]
+    return HttpResponse(render(collect(), extra), content_type='text/plain; version=0.0.4; charset=utf-8')
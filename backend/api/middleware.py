@@ -0,0 +1,93 @@
+"""
+Request metrics for /metrics (api/metrics.py).
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metrics
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+
+# The current request's counter. Context variables follow the request into
+# sync_to_async threads, so ORM calls made from async views are counted too.
+_counter = contextvars.ContextVar('crop_query_counter', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """Permanent execute wrapper on every connection; counts for the current request, if any."""
+    counter = _counter.get()
+    if counter is not None:
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@receiver(connection_created)
+def count_queries_on_new_connection(sender, connection, **kwargs):
+    install_query_counter(connection)
+
+
+class MetricsMiddleware:
+    """
+    Latency per route/method/status and database queries per route. Routes
+    are the URL patterns (``api/history/<pk>/``), not raw paths, so the
+    number of series stays bounded. Works in both sync (WSGI) and async
+    (ASGI) chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.CROP_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened before this module was imported
+        install_query_counter(connections['default'])
+        token, queries, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _counter.reset(token)
+        self._record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        token, queries, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _counter.reset(token)
+        self._record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    def _start(self):
+        metrics.flusher.ensure_started()
+        queries = QueryCounter()
+        return _counter.set(queries), queries, time.perf_counter()
+
+    def _record(self, request, response, queries, elapsed):
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+        metrics.request_seconds.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        metrics.request_queries.observe(queries.count, route=route)
@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_disease_care_tips_disease_healthy_image_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='disease',
+            name='care_tips_rw',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='disease',
+            name='description_rw',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='disease',
+            name='name_rw',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='disease',
+            name='treatment_rw',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# Copied here so later edits to api/translator.py cannot change this migration
+DEFAULT_DISEASES = [
+    {
+        'name': 'Banana Bacterial Wilt',
+        'species': 'Banana',
+        'description': 'Bacterial disease causing wilting and yellowing.',
+        'treatment': 'Rogue infected plants, sanitize tools, use clean planting material.',
+        'care_tips': 'Maintain field hygiene; use resistant varieties; avoid tool sharing between fields, or contact one of our expert',
+        'name_rw': 'Indwara ya Banana yo kurwara kuri Bacteria',
+        'description_rw': 'Indwara ya Bacteria ishobora gutuma ibimera byumva ubucucu no kuba umuhondo.',
+        'treatment_rw': 'Kuraho ibimera byarwaye, gukoresha ibikoresho byo gusukura, gukoresha ibyatsi byo gutera byera.',
+        'care_tips_rw': "Komeza gusana isambu; gukoresha ubwoko butakwicwa; kwirinda gusangiza ibikoresho hagati y'amasambu, cyangwa wabwira umwe mu banyabwenge."
+    },
+    {
+        'name': 'Maize Leaf Blight',
+        'species': 'Maize',
+        'description': 'Fungal leaf spots reducing photosynthesis.',
+        'treatment': 'Rotate crops, remove residue, apply recommended fungicide if severe.',
+        'care_tips': 'Ensure spacing for airflow; balanced fertilization; timely weeding, or contact one of our expert',
+        'name_rw': "Indwara y'ibimera bya Maize",
+        'description_rw': "Ibiranga by'ibimera bifite amabara y'umweru bigabanya ubwoko bw'ibimera.",
+        'treatment_rw': 'Guhindura ibihingwa, gukuraho ibisigazwa, gukoresha ifungisidi zirinzwe niba byarakaze.',
+        'care_tips_rw': 'Kureba neza intera yo gukoresha umwuka; gukoresha ifumbire yuzuye; kubagura ibyatsi mu bihe, cyangwa wabwira umwe mu banyabwenge.'
+    },
+    {
+        'name': 'Potato Late Blight',
+        'species': 'Potato',
+        'description': 'Oomycete disease causing dark lesions on leaves and tubers.',
+        'treatment': 'Use certified seed, ensure airflow, apply protective fungicide as advised.',
+        'care_tips': 'Avoid overhead irrigation late in day; remove infected leaves; monitor weather alerts, or contact one of our expert',
+        'name_rw': 'Indwara ya Potato yo kurwara',
+        'description_rw': "Indwara ya Oomycete ishobora gutuma haba amabara y'umukara kuri ibimera n'ibinyabutumbura.",
+        'treatment_rw': "Gukoresha imbuto zemewe, kureba neza ko umwuka uhagaze, gukoresha ifungisidi zirinzwe nk'uko byavuzwe.",
+        'care_tips_rw': "Kwirinda gutera amazi mu gihe cy'umunsi; gukuraho ibibabi byarwaye; kureba amakuru y'ibihe, cyangwa wabwira umwe mu banyabwenge."
+    },
+]
+
+
+def seed_diseases(apps, schema_editor):
+    """Seed the default catalogue once, instead of checking on every detection."""
+    Disease = apps.get_model('api', 'Disease')
+    if Disease.objects.exists():
+        return
+    for d in DEFAULT_DISEASES:
+        fields = dict(d)
+        Disease.objects.get_or_create(name=fields.pop('name'), species=fields.pop('species'), defaults=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_disease_translations'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_diseases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_detectionjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detectionhistory',
+            index=models.Index(fields=['user', '-detected_at', '-id'], name='history_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detectionhistory',
+            index=models.Index(fields=['-detected_at', '-id'], name='history_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detectionhistory',
+            index=models.Index(fields=['predicted_disease', '-detected_at', '-id'], name='history_disease_time_idx'),
+        ),
+    ]
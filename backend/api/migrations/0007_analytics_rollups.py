@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-18 21:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDetectionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('confidence_sum', models.FloatField(default=0.0)),
+                ('last_detected_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='detection_stat', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyDetectionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('species', models.CharField(blank=True, default='', max_length=100)),
+                ('confidence_bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('confidence_sum', models.FloatField(default=0.0)),
+                ('disease', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.disease')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='daily_stat_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'disease', 'confidence_bucket'), name='unique_daily_stat')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectionhistory',
+            name='thumbnail',
+            field=models.ImageField(blank=True, max_length=255, upload_to='thumbnails/'),
+        ),
+    ]
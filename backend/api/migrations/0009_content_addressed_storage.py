@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-18 21:10
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_detectionhistory_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detectionhistory',
+            name='image',
+            field=models.ImageField(storage=api.storage.detection_storage, upload_to='detection_images/'),
+        ),
+        migrations.AlterField(
+            model_name='detectionhistory',
+            name='thumbnail',
+            field=models.ImageField(blank=True, max_length=255, storage=api.storage.detection_storage, upload_to='thumbnails/'),
+        ),
+        migrations.AlterField(
+            model_name='detectionjob',
+            name='image',
+            field=models.ImageField(storage=api.storage.detection_storage, upload_to='detection_images/'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1 on 2026-10-18 22:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='disease',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
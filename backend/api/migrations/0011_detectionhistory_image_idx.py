@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 21:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_disease_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detectionhistory',
+            index=models.Index(fields=['image'], name='history_image_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_detectionhistory_image_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectionjob',
+            name='mode',
+            field=models.CharField(choices=[('standard', 'Standard'), ('tta', 'Test-time augmentation')], default='standard', max_length=10),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from .storage import detection_storage
+
 class User(AbstractUser):
     is_expert = models.BooleanField(default=False)
     # If you want extra fields, add them here
@@ -13,15 +15,113 @@ class Disease(models.Model):
     healthy_image_url = models.URLField(blank=True, default='')
     care_tips = models.TextField(blank=True, default='')
 
+    # Kinyarwanda translations, filled in on save (see api/signals.py)
+    name_rw = models.CharField(max_length=200, blank=True, default='')
+    description_rw = models.TextField(blank=True, default='')
+    treatment_rw = models.TextField(blank=True, default='')
+    care_tips_rw = models.TextField(blank=True, default='')
+
+    # Last-Modified of the published catalogue (api/catalogue.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    TRANSLATED_FIELDS = ('name', 'description', 'treatment', 'care_tips')
+
     def __str__(self):
         return f"{self.name} ({self.species})"
 
+    def translation(self):
+        return {f'{field}_rw': getattr(self, f'{field}_rw') for field in self.TRANSLATED_FIELDS}
+
 class DetectionHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='detections')
-    image = models.ImageField(upload_to='detection_images/')
+    image = models.ImageField(upload_to='detection_images/', storage=detection_storage)
+    # Set by api/thumbnails.py the first time the thumbnail is requested
+    thumbnail = models.ImageField(upload_to='thumbnails/', storage=detection_storage, max_length=255, blank=True)
     predicted_disease = models.ForeignKey(Disease, on_delete=models.SET_NULL, null=True)
     confidence = models.FloatField()
     detected_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Match the history listing: newest first, per user or per disease
+        indexes = [
+            models.Index(fields=['user', '-detected_at', '-id'], name='history_user_time_idx'),
+            models.Index(fields=['-detected_at', '-id'], name='history_time_idx'),
+            models.Index(fields=['predicted_disease', '-detected_at', '-id'], name='history_disease_time_idx'),
+            # Thumbnail lookups by stored image name
+            models.Index(fields=['image'], name='history_image_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.predicted_disease} - {self.detected_at}"
+
+class DetectionJob(models.Model):
+    """An uploaded image waiting for, or done with, background detection."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    STANDARD = 'standard'
+    TTA = 'tta'
+    MODE_CHOICES = [
+        (STANDARD, 'Standard'),
+        (TTA, 'Test-time augmentation'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='detection_jobs')
+    # Stored where history images live so the finished DetectionHistory reuses the file
+    image = models.ImageField(upload_to='detection_images/', storage=detection_storage)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default=STANDARD)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    detection = models.ForeignKey(DetectionHistory, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status}) for {self.user.username}"
+
+
+# Analytics rollups, maintained incrementally by api/analytics.py
+
+class DailyDetectionStat(models.Model):
+    """Detections per day, disease and confidence decile."""
+    day = models.DateField()
+    # SET_NULL mirrors DetectionHistory: a deleted disease's counts become "unclassified"
+    disease = models.ForeignKey(Disease, on_delete=models.SET_NULL, null=True, blank=True)
+    species = models.CharField(max_length=100, blank=True, default='')
+    confidence_bucket = models.PositiveSmallIntegerField()  # 0 = [0, 0.1), ..., 9 = [0.9, 1.0]
+    count = models.PositiveIntegerField(default=0)
+    confidence_sum = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'disease', 'confidence_bucket'], name='unique_daily_stat'),
+        ]
+        indexes = [models.Index(fields=['day'], name='daily_stat_day_idx')]
+
+    def __str__(self):
+        return f"{self.day} {self.disease} [{self.confidence_bucket}]: {self.count}"
+
+
+class UserDetectionStat(models.Model):
+    """All-time detection totals per user."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='detection_stat')
+    count = models.PositiveIntegerField(default=0)
+    confidence_sum = models.FloatField(default=0.0)
+    last_detected_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.count}"
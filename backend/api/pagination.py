@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DetectionHistoryCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (detected_at, id): each page is an index range scan,
+    so latency does not grow with the size of the history table.
+    """
+    ordering = ('-detected_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
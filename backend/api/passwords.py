@@ -0,0 +1,81 @@
+"""
+Bounded password hashing.
+
+A password hash costs hundreds of milliseconds of CPU by design, and it
+runs on the request thread that asked for it. Per worker, at most
+CROP_PASSWORD_HASH_WORKERS hashes run at once, and logins/registrations
+beyond that queue for a slot for up to CROP_PASSWORD_HASH_WAIT seconds.
+The queue holds at most CROP_PASSWORD_HASH_MAX_PENDING requests (hashing
+or waiting), which stays below gunicorn's 4 threads, so a burst of
+sign-ups always leaves a thread for detection and history. Past either
+bound HashingBusy is raised; the view answers 503 with Retry-After and
+the frontend retries.
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.contrib.auth.signals import user_login_failed
+
+_pending = threading.BoundedSemaphore(settings.CROP_PASSWORD_HASH_MAX_PENDING)
+_hashing = threading.BoundedSemaphore(settings.CROP_PASSWORD_HASH_WORKERS)
+
+
+class HashingBusy(Exception):
+    """The hashing queue in this process is full or did not move in time."""
+
+
+def _run(func, *args):
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy("Password hashing queue is full")
+    try:
+        if not _hashing.acquire(timeout=settings.CROP_PASSWORD_HASH_WAIT):
+            raise HashingBusy("Timed out waiting to hash a password")
+        try:
+            return func(*args)
+        finally:
+            _hashing.release()
+    finally:
+        _pending.release()
+
+
+def hash_password(raw_password):
+    return _run(make_password, raw_password)
+
+
+def needs_rehash(encoded):
+    """True if ``encoded`` was made by another hasher or with other costs than the current default."""
+    preferred = get_hasher('default')
+    return identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def verify_login(username, password, request=None):
+    """
+    The active user with these credentials, or None. This behaves like
+    django.contrib.auth.authenticate() with ModelBackend, but the hashing
+    is bounded as above. A hash made with an older hasher or cost is
+    upgraded once the password is known to be right.
+    """
+    if not username or password is None:
+        return None
+    User = get_user_model()
+    try:
+        user = User._default_manager.get_by_natural_key(username)
+    except User.DoesNotExist:
+        user = None
+
+    if user is None:
+        # Hash anyway so unknown usernames take as long as wrong passwords
+        _run(make_password, password)
+        valid = False
+    else:
+        valid = _run(check_password, password, user.password) and user.is_active
+
+    if not valid:
+        user_login_failed.send(sender=__name__, credentials={'username': username}, request=request)
+        return None
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        user.save(update_fields=['password'])
+    return user
@@ -0,0 +1,105 @@
+"""
+Cheap crop-validity check run before any model or database work.
+
+Selfies, screenshots and documents are rejected from a downsampled copy of
+the decoded tensor using two vectorized colour measures: the excess-green
+index (how much greener than red/blue the image is on average) and the
+fraction of pixels whose HSV hue falls in the foliage band. Diseased
+leaves are often yellow or brown, so an image passes if either measure
+clears its threshold.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+
+
+@dataclass
+class PrefilterResult:
+    passed: bool
+    green_score: float      # mean of g - (r + b) / 2 on a 0-255 scale
+    green_fraction: float   # share of saturated pixels with a foliage hue
+    elapsed_ms: float
+
+
+class PrefilterStats:
+    """Running totals for the pre-filter stage, shared by all request threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+
+    def record(self, result):
+        with self._lock:
+            self.checked += 1
+            self.rejected += 0 if result.passed else 1
+            self.total_ms += result.elapsed_ms
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'rejected': self.rejected,
+                'mean_ms': self.total_ms / self.checked if self.checked else 0.0,
+            }
+
+
+stats = PrefilterStats()
+
+
+def _sample(tensor, sample_side):
+    """Strided view of an (H, W, 3) array with roughly ``sample_side`` pixels per side."""
+    step = max(1, min(tensor.shape[0], tensor.shape[1]) // sample_side)
+    return tensor[::step, ::step]
+
+
+def green_measures(tensor, sample_side=64):
+    """Return (green_score, green_fraction) for a float32 [0, 1] RGB tensor."""
+    pixels = _sample(tensor, sample_side).reshape(-1, 3)
+    r, g, b = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+
+    green_score = float(np.mean(g - (r + b) / 2.0)) * 255.0
+
+    high = pixels.max(axis=1)
+    low = pixels.min(axis=1)
+    delta = high - low
+    saturation = np.divide(delta, high, out=np.zeros_like(delta), where=high > 0)
+    safe_delta = np.where(delta > 0, delta, 1.0)
+    hue = np.select(
+        [high == r, high == g],
+        [((g - b) / safe_delta) % 6.0, (b - r) / safe_delta + 2.0],
+        default=(r - g) / safe_delta + 4.0,
+    ) * 60.0
+
+    hue_min, hue_max = settings.CROP_PREFILTER_HUE_RANGE
+    foliage = (
+        (hue >= hue_min) & (hue <= hue_max)
+        & (saturation >= settings.CROP_PREFILTER_MIN_SATURATION)
+        & (high >= 0.1)
+    )
+    return green_score, float(np.mean(foliage))
+
+
+def check_crop(tensor):
+    """Run the pre-filter on a decoded image tensor and record its timing."""
+    start = time.perf_counter()
+    if settings.CROP_PREFILTER_ENABLED:
+        green_score, green_fraction = green_measures(tensor)
+        passed = (
+            green_score >= settings.CROP_PREFILTER_MIN_GREEN_SCORE
+            or green_fraction >= settings.CROP_PREFILTER_MIN_GREEN_FRACTION
+        )
+    else:
+        green_score, green_fraction, passed = 0.0, 0.0, True
+    result = PrefilterResult(
+        passed=passed,
+        green_score=round(green_score, 2),
+        green_fraction=round(green_fraction, 3),
+        elapsed_ms=(time.perf_counter() - start) * 1000.0,
+    )
+    stats.record(result)
+    return result
@@ -0,0 +1,89 @@
+"""
+Bounded-memory image decoding for detection uploads.
+
+Phone photos are 12-50 MP, but the model only needs a few hundred pixels
+per side. ``load_image`` reads the header first and rejects oversized or
+tiny images before any pixels are decoded, then asks the JPEG decoder for a
+reduced-scale image (draft mode) close to the model input size, so a full
+resolution bitmap is never allocated for JPEG uploads.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+RGB_BANDS = 3
+
+
+class ImageRejected(ValueError):
+    """The upload is a readable image but cannot be used for detection."""
+
+
+@dataclass
+class PreparedImage:
+    tensor: np.ndarray      # (H, W, 3) float32 in [0, 1]
+    image: Image.Image      # RGB image at model input size
+    original_size: tuple    # (width, height) declared in the file header
+    decoded_size: tuple     # (width, height) actually decoded
+    peak_bytes: int         # largest amount of pixel memory held at once
+
+
+def to_tensor(image, out=None):
+    """Scale an RGB image to float32 [0, 1], writing into ``out`` when given."""
+    pixels = np.asarray(image, dtype=np.uint8)
+    if out is None:
+        out = np.empty(pixels.shape, dtype=np.float32)
+    np.multiply(pixels, np.float32(1.0 / 255.0), out=out, casting='unsafe')
+    return out
+
+
+def load_image(fileobj, target_size, max_pixels=None, min_side=None, out=None):
+    """
+    Decode ``fileobj`` straight to ``target_size`` (width, height).
+
+    Raises ImageRejected for images outside the accepted size range and lets
+    PIL errors propagate for files that are not images at all. The file
+    position is reset afterwards so the upload can still be stored.
+    """
+    max_pixels = max_pixels or settings.CROP_MAX_IMAGE_PIXELS
+    min_side = min_side if min_side is not None else settings.CROP_MIN_IMAGE_SIDE
+
+    image = Image.open(fileobj)  # reads the header only
+    width, height = image.size
+    if width < min_side or height < min_side:
+        raise ImageRejected("Image too small")
+    if width * height > max_pixels:
+        raise ImageRejected(
+            f"Image too large: {width}x{height} exceeds {max_pixels} pixels"
+        )
+
+    # JPEG decodes at 1/2, 1/4 or 1/8 scale, never below the requested size
+    image.draft('RGB', target_size)
+    image.load()
+    decoded_size = image.size
+    live = decoded_size[0] * decoded_size[1] * len(image.getbands())
+    peak = live
+
+    if image.mode != 'RGB':
+        rgb = image.convert('RGB')
+        peak = max(peak, live + decoded_size[0] * decoded_size[1] * RGB_BANDS)
+        image = rgb  # drops the decoded bitmap; close() would close the upload
+        live = decoded_size[0] * decoded_size[1] * RGB_BANDS
+
+    if image.size != tuple(target_size):
+        resized = image.resize(target_size, Image.BILINEAR, reducing_gap=2.0)
+        peak = max(peak, live + target_size[0] * target_size[1] * RGB_BANDS)
+        image = resized
+
+    tensor = to_tensor(image, out=out)
+    peak = max(peak, target_size[0] * target_size[1] * RGB_BANDS + tensor.nbytes)
+
+    fileobj.seek(0)
+    return PreparedImage(
+        tensor=tensor,
+        image=image,
+        original_size=(width, height),
+        decoded_size=decoded_size,
+        peak_bytes=peak,
+    )
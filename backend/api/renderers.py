@@ -0,0 +1,18 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that records its encoding time as the ``serialize`` stage."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start = time.perf_counter()
+        body = super().render(data, accepted_media_type, renderer_context)
+        request = (renderer_context or {}).get('request')
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.url_name if match is not None and match.url_name else 'unknown'
+        metrics.stage_seconds.observe(time.perf_counter() - start, endpoint=endpoint, stage='serialize')
+        return body
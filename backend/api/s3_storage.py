@@ -0,0 +1,15 @@
+"""
+Content-addressed storage on Amazon S3 or an S3-compatible server
+(MinIO, SeaweedFS, Ceph RGW...). Needs ``django-storages[s3]``; it is only
+imported when STORAGES["detections"] points here (CROP_MEDIA_STORAGE=s3).
+"""
+from storages.backends.s3 import S3Storage
+
+from .storage import ContentAddressedMixin
+
+
+class ContentAddressedS3Storage(ContentAddressedMixin, S3Storage):
+    """Sharded, deduplicating object storage; keys mirror the local layout."""
+
+    # Objects never change under a content-addressed key
+    file_overwrite = True
@@ -1,6 +1,11 @@
 from rest_framework import serializers
-from .models import User, Disease, DetectionHistory
+from .models import User, Disease, DetectionHistory, DetectionJob
+from . import passwords
 from django.contrib.auth import get_user_model
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.signing import Signer
+from django.urls import reverse
+from django.utils.http import urlencode
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,6 +19,9 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ('id', 'username', 'password', 'is_expert')
+        # RegisterView checks username and email in one query (and handles the
+        # IntegrityError of a concurrent sign-up), so no UniqueValidator query here
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
 
     def validate_username(self, value):
         if len(value) < 3:
@@ -21,11 +29,14 @@ class RegisterSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        user = get_user_model().objects.create_user(
-            username=validated_data['username'],
-            password=validated_data['password'],
+        UserModel = get_user_model()
+        user = UserModel(
+            username=UserModel.normalize_username(validated_data['username']),
             is_expert=validated_data.get('is_expert', False)
         )
+        # Hashing is bounded by api/passwords.py
+        user.password = passwords.hash_password(validated_data['password'])
+        user.save()
         return user
 
 class DiseaseSerializer(serializers.ModelSerializer):
@@ -33,14 +44,23 @@ class DiseaseSerializer(serializers.ModelSerializer):
         model = Disease
         fields = '__all__'
 
+def thumbnail_signature(name):
+    """
+    <img> tags cannot send the JWT, so the thumbnail endpoint only renders
+    for links handed out by the (authenticated) history endpoints.
+    """
+    return Signer(salt='api.thumbnail').signature(name)
+
+
 class DetectionHistorySerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     predicted_disease = DiseaseSerializer(read_only=True)
     image = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = DetectionHistory
-        fields = '__all__'
+        exclude = ('thumbnail',)
     
     def get_image(self, obj):
         """Return full image URL"""
@@ -51,3 +71,35 @@ class DetectionHistorySerializer(serializers.ModelSerializer):
             # Fallback if no request context
             return f"/media/{obj.image.name}"
         return None
+
+    def get_thumbnail_url(self, obj):
+        """Stored thumbnail, or the endpoint that generates it on first request"""
+        if obj.thumbnail:
+            url = obj.thumbnail.url
+        elif obj.image:
+            url = reverse('thumbnail', args=[obj.image.name])
+            url += '?' + urlencode({'sig': thumbnail_signature(obj.image.name)})
+        else:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class DiseaseSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Disease
+        fields = ('id', 'name', 'species')
+
+class DetectionHistoryListSerializer(DetectionHistorySerializer):
+    """Lean rows for history listings; the full disease is on the detail endpoint."""
+    predicted_disease = DiseaseSummarySerializer(read_only=True)
+
+    class Meta:
+        model = DetectionHistory
+        fields = ('id', 'user', 'image', 'thumbnail_url', 'predicted_disease', 'confidence', 'detected_at')
+
+
+class DetectionJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DetectionJob
+        fields = ('id', 'status', 'result', 'error', 'created_at', 'started_at', 'finished_at')
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Disease, DetectionHistory
+from .translator import translate_disease
+from .catalogue import catalogue
+from . import analytics, authentication, dedup
+
+
+@receiver(post_delete, sender=DetectionHistory)
+def forget_deleted_detection(sender, instance, **kwargs):
+    """A deleted detection must not be served again from the upload cache."""
+    dedup.forget_detection(instance.id)
+
+
+@receiver(post_save, sender=DetectionHistory)
+def record_detection(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        analytics.record(instance)
+
+
+@receiver(post_delete, sender=DetectionHistory)
+def forget_detection_stats(sender, instance, **kwargs):
+    analytics.forget(instance)
+
+
+@receiver(pre_save, sender=Disease)
+def translate_changed_fields(sender, instance, raw=False, **kwargs):
+    """Translate new or edited text once, at save time, instead of per detection."""
+    if raw:
+        return
+    previous = None
+    if instance.pk:
+        previous = Disease.objects.filter(pk=instance.pk).values(*Disease.TRANSLATED_FIELDS).first()
+    changed = [
+        field for field in Disease.TRANSLATED_FIELDS
+        if not getattr(instance, f'{field}_rw')
+        or (previous is not None and previous[field] != getattr(instance, field))
+    ]
+    translate_disease(instance, changed)
+
+
+@receiver(post_save, sender=Disease)
+@receiver(post_delete, sender=Disease)
+def invalidate_catalogue(sender, **kwargs):
+    catalogue.invalidate()
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_cached_user(sender, instance, **kwargs):
+    """Deactivated, edited or deleted users must not authenticate from the cache."""
+    authentication.forget_user(instance.pk)
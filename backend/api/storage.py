@@ -0,0 +1,102 @@
+"""
+Content-addressed media storage for detection images.
+
+Files are named after the SHA-256 of their bytes and sharded into nested
+directories, e.g. ``detection_images/3f/a2/3fa2…c1.jpg``. No directory
+grows past a few thousand entries, and a photo uploaded many times is
+stored once. Every upload of it resolves to the same name.
+
+The ``detections`` alias in settings.STORAGES selects the backend:
+``ContentAddressedStorage`` on local disk, or
+``api.s3_storage.ContentAddressedS3Storage`` for any S3-compatible service.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+
+from .uploads import memory_buffer, upload_digest
+
+# Extensions kept on stored names; any other client-supplied one is dropped
+EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff', '.heic', '.heif'}
+
+
+def detection_storage():
+    """Storage for DetectionHistory/DetectionJob images (STORAGES["detections"])."""
+    return storages['detections']
+
+
+class ContentAddressedMixin:
+    """Name files by content hash; mix into any Storage class ahead of it."""
+
+    shard_depth = 2
+    shard_width = 2
+
+    def __init__(self, *args, shard_depth=None, shard_width=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shard_depth = shard_depth if shard_depth is not None else self.shard_depth
+        self.shard_width = shard_width if shard_width is not None else self.shard_width
+
+    def addressed_name(self, name, digest):
+        """``<top-level dir>/<shards>/<digest><ext>`` for an upload named ``name``."""
+        top = name.split('/', 1)[0] if '/' in name else ''
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in EXTENSIONS:
+            extension = ''
+        shards = [
+            digest[i * self.shard_width:(i + 1) * self.shard_width]
+            for i in range(self.shard_depth)
+        ]
+        return '/'.join(part for part in [top, *shards, digest + extension] if part)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = upload_digest(content)  # hashed on receipt by api/uploads.py
+        if digest is None:
+            hasher = hashlib.sha256()
+            for chunk in content.chunks():
+                hasher.update(chunk)
+            content.seek(0)
+            digest = hasher.hexdigest()
+
+        name = self.get_available_name(self.addressed_name(self.generate_filename(name), digest), max_length)
+        if self.exists(name):
+            return name  # same bytes already stored
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Equal names mean equal bytes: never append a random suffix, and
+        # never truncate, which would address different bytes
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Storage name "{name}" is longer than {max_length} characters.'
+            )
+        return name
+
+
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    """Sharded, deduplicating storage on the local filesystem (MEDIA_ROOT)."""
+
+    def _save(self, name, content):
+        # Write under a temporary name and rename into place, so a concurrent
+        # upload of the same bytes never sees a half-written file
+        partial = f"{name}.{uuid.uuid4().hex}.part"
+        view = memory_buffer(content)
+        if view is None:
+            # Spooled uploads are moved, everything else is streamed in chunks
+            partial = super()._save(partial, content)
+        else:
+            os.makedirs(os.path.dirname(self.path(partial)), exist_ok=True)
+            with view, open(self.path(partial), 'wb') as fh:
+                fh.write(view)
+            if self.file_permissions_mode is not None:
+                os.chmod(self.path(partial), self.file_permissions_mode)
+        os.replace(self.path(partial), self.path(name))
+        return name
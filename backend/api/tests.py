@@ -0,0 +1,112 @@
+import importlib.util
+import io
+import os
+import tempfile
+from unittest import skipUnless
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from . import analytics
+from .inference import Classifier, ModelRegistry, ModelUnavailable
+from .models import DailyDetectionStat, DetectionHistory, User, UserDetectionStat
+
+HAS_TENSORFLOW = importlib.util.find_spec('tensorflow') is not None
+
+
+class ConstantModel:
+    """Stands in for a Keras model: always favours the first class."""
+
+    def __call__(self, batch, training=False):
+        outputs = np.zeros((len(batch), 3), dtype=np.float32)
+        outputs[:, 0] = 3.0
+        return outputs
+
+
+class BrokenModel:
+    def __call__(self, batch, training=False):
+        raise RuntimeError("bad graph")
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def test_warm_up_and_predict(self):
+        registry = ModelRegistry()
+        registry.set(Classifier(ConstantModel(), ['Blight', 'Wilt', 'Healthy'], (32, 32)))
+        self.assertTrue(registry.warm_up())
+        prediction = registry.get().predict(Image.new('RGB', (300, 200), (40, 160, 40)))
+        self.assertEqual(prediction.label, 'Blight')
+        self.assertGreater(prediction.confidence, 0.5)
+
+    @override_settings(CROP_MODEL_PATH='/nonexistent/model.keras')
+    def test_warm_up_without_model(self):
+        self.assertFalse(ModelRegistry().warm_up())
+
+    def test_warm_up_never_raises(self):
+        registry = ModelRegistry()
+        registry.set(Classifier(BrokenModel(), ['Blight', 'Wilt', 'Healthy'], (32, 32)))
+        with self.assertLogs('api.inference', 'ERROR'):
+            self.assertFalse(registry.warm_up())
+
+    def test_label_count_mismatch(self):
+        classifier = Classifier(ConstantModel(), ['Blight', 'Healthy'], (32, 32))
+        with self.assertRaises(ModelUnavailable):
+            classifier.predict_batch(np.zeros((1, 32, 32, 3), dtype=np.float32))
+
+
+@skipUnless(HAS_TENSORFLOW, "TensorFlow is not installed")
+class TinyModelTests(TestCase):
+    """Load, warm up and run the model written by ``build_tiny_model``."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model_path = os.path.join(directory.name, 'tiny.keras')
+        self.labels_path = os.path.join(directory.name, 'labels.json')
+        call_command('build_tiny_model', output=self.model_path, labels=self.labels_path, stdout=io.StringIO())
+
+    def test_load_warm_up_predict(self):
+        with override_settings(CROP_MODEL_BACKEND='keras', CROP_MODEL_PATH=self.model_path,
+                               CROP_MODEL_LABELS=self.labels_path):
+            registry = ModelRegistry()
+            self.assertTrue(registry.warm_up())
+            classifier = registry.get()
+            self.assertEqual(classifier.input_size, (32, 32))
+            prediction = classifier.predict(Image.new('RGB', (300, 200), (40, 160, 40)))
+        self.assertIn(prediction.label, classifier.labels)
+        self.assertTrue(0.0 <= prediction.confidence <= 1.0)
+
+
+class BenchHistoryQueriesTests(TransactionTestCase):
+    """The benchmark seeds with raw SQL, so it breaks silently when columns are added."""
+    serialized_rollback = True
+
+    def test_seed_and_run(self):
+        out = io.StringIO()
+        call_command('bench_history_queries', rows=50, users=3, iterations=2, stdout=out)
+        self.assertIn("Seeded 50 rows", out.getvalue())
+        self.assertIn("After (history indexes present)", out.getvalue())
+        call_command('bench_history_queries', cleanup=True, stdout=io.StringIO())
+
+
+class AnalyticsRollupTests(TestCase):
+
+    def test_forget_with_several_unclassified_rows(self):
+        # Two deleted diseases leave two NULL-disease rows for the same key
+        user = User.objects.create(username='farmer')
+        detected_at = timezone.now()
+        key = dict(day=timezone.localdate(detected_at), disease=None, confidence_bucket=8)
+        empty = DailyDetectionStat.objects.create(**key, count=0, confidence_sum=0.0)
+        full = DailyDetectionStat.objects.create(**key, count=1, confidence_sum=0.85)
+        UserDetectionStat.objects.create(user=user, count=1, confidence_sum=0.85)
+
+        analytics.forget(DetectionHistory(user=user, confidence=0.85, detected_at=detected_at))
+
+        empty.refresh_from_db()
+        full.refresh_from_db()
+        self.assertEqual((empty.count, full.count), (0, 0))
+        self.assertAlmostEqual(full.confidence_sum, 0.0)
+        self.assertEqual(UserDetectionStat.objects.get(user=user).count, 0)
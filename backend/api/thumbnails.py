@@ -0,0 +1,117 @@
+"""
+Small display copies of detection images.
+
+History cards only need a few hundred pixels, but ``image`` points at the
+original multi-megabyte phone photo. A thumbnail is generated the first
+time ``/api/thumbnails/<image name>`` is requested, stored next to the
+originals, and recorded on every DetectionHistory row that shares the
+image, so later listings link the stored file directly.
+
+Generation is bounded per process: at most CROP_THUMBNAIL_MAX_CONCURRENT
+renders run at once, and requests beyond that get ``Busy`` instead of
+queueing behind them.
+"""
+import io
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+from .models import DetectionHistory
+from .preprocessing import ImageRejected
+
+UPLOAD_PREFIX = 'detection_images/'
+
+
+def image_storage():
+    """The storage DetectionHistory files live in; thumbnails go next to them."""
+    return DetectionHistory._meta.get_field('image').storage
+
+
+def thumbnail_format():
+    """WebP when Pillow was built with it, JPEG otherwise."""
+    if settings.CROP_THUMBNAIL_FORMAT == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return settings.CROP_THUMBNAIL_FORMAT
+
+
+class Busy(Exception):
+    """Every render slot in this process is taken."""
+
+
+_slots = threading.BoundedSemaphore(settings.CROP_THUMBNAIL_MAX_CONCURRENT)
+# Striped so concurrent first requests for one image render it once
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def upload_name():
+    """
+    Nominal name for a new thumbnail. Content-addressed storage
+    (api/storage.py) renames it after its hash, so the stored name is only
+    known from DetectionHistory.thumbnail.
+    """
+    extension = 'webp' if thumbnail_format() == 'WEBP' else 'jpg'
+    return f"thumbnails/thumbnail.{extension}"
+
+
+def recorded(name):
+    """
+    The thumbnail recorded for the original ``name``: None when no
+    detection uses that image, '' when none has been generated yet.
+    """
+    names = (
+        DetectionHistory.objects.filter(image=name)
+        .order_by('-thumbnail').values_list('thumbnail', flat=True)[:1]
+    )
+    return next(iter(names), None)
+
+
+def render(fileobj, size=None):
+    """Encode a thumbnail of ``fileobj`` fitting in a ``size`` x ``size`` box."""
+    size = size or settings.CROP_THUMBNAIL_SIZE
+    image = Image.open(fileobj)
+    width, height = image.size
+    if width * height > settings.CROP_MAX_IMAGE_PIXELS:
+        raise ImageRejected(f"Image too large: {width}x{height}")
+
+    # Decode at reduced scale: the thumbnail never needs the full bitmap
+    image.draft('RGB', (size, size))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+
+    buffer = io.BytesIO()
+    image.save(buffer, thumbnail_format(), quality=settings.CROP_THUMBNAIL_QUALITY)
+    return buffer.getvalue()
+
+
+def ensure(name, storage=None):
+    """
+    Return the stored thumbnail's name for ``name``, generating and
+    recording it if missing. Returns None for images no detection uses;
+    raises Busy when no render slot is free.
+    """
+    storage = storage or image_storage()
+    existing = recorded(name)
+    if existing is None or (existing and storage.exists(existing)):
+        return existing
+    if not _slots.acquire(blocking=False):
+        raise Busy(name)
+    try:
+        with _locks[hash(name) % len(_locks)]:
+            existing = recorded(name)
+            if existing and storage.exists(existing):
+                return existing
+            with storage.open(name, 'rb') as fh:
+                data = render(fh)
+            thumb = storage.save(upload_name(), ContentFile(data))
+            DetectionHistory.objects.filter(image=name).update(thumbnail=thumb)
+            return thumb
+    finally:
+        _slots.release()
+
+
+def is_detection_image(name):
+    return name.startswith(UPLOAD_PREFIX) and '..' not in name.split('/')
@@ -0,0 +1,35 @@
+"""
+Per-request stage timings for the detection endpoints.
+
+    timer = StageTimer()
+    with timer.stage('decode'):
+        ...
+    result['timings_ms'] = timer.as_dict()
+"""
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Wall-clock milliseconds spent in each named stage of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000.0
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def as_dict(self):
+        timings = {name: round(ms, 2) for name, ms in self.stages.items()}
+        timings['total'] = round(self.elapsed_ms(), 2)
+        return timings
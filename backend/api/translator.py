@@ -1,21 +1,54 @@
+from functools import lru_cache
+
+from django.conf import settings
+
+# Known Kinyarwanda translations for the default disease catalogue
+TRANSLATIONS = {
+    'Banana Bacterial Wilt': 'Indwara ya Banana yo kurwara kuri Bacteria',
+    'Maize Leaf Blight': 'Indwara y\'ibimera bya Maize',
+    'Potato Late Blight': 'Indwara ya Potato yo kurwara',
+    'Bacterial disease causing wilting and yellowing.': 'Indwara ya Bacteria ishobora gutuma ibimera byumva ubucucu no kuba umuhondo.',
+    'Fungal leaf spots reducing photosynthesis.': 'Ibiranga by\'ibimera bifite amabara y\'umweru bigabanya ubwoko bw\'ibimera.',
+    'Oomycete disease causing dark lesions on leaves and tubers.': 'Indwara ya Oomycete ishobora gutuma haba amabara y\'umukara kuri ibimera n\'ibinyabutumbura.',
+    'Rogue infected plants, sanitize tools, use clean planting material.': 'Kuraho ibimera byarwaye, gukoresha ibikoresho byo gusukura, gukoresha ibyatsi byo gutera byera.',
+    'Rotate crops, remove residue, apply recommended fungicide if severe.': 'Guhindura ibihingwa, gukuraho ibisigazwa, gukoresha ifungisidi zirinzwe niba byarakaze.',
+    'Use certified seed, ensure airflow, apply protective fungicide as advised.': 'Gukoresha imbuto zemewe, kureba neza ko umwuka uhagaze, gukoresha ifungisidi zirinzwe nk\'uko byavuzwe.',
+    'Maintain field hygiene; use resistant varieties; avoid tool sharing between fields, or contact one of our expert': 'Komeza gusana isambu; gukoresha ubwoko butakwicwa; kwirinda gusangiza ibikoresho hagati y\'amasambu, cyangwa wabwira umwe mu banyabwenge.',
+    'Ensure spacing for airflow; balanced fertilization; timely weeding, or contact one of our expert': 'Kureba neza intera yo gukoresha umwuka; gukoresha ifumbire yuzuye; kubagura ibyatsi mu bihe, cyangwa wabwira umwe mu banyabwenge.',
+    'Avoid overhead irrigation late in day; remove infected leaves; monitor weather alerts, or contact one of our expert': 'Kwirinda gutera amazi mu gihe cy\'umunsi; gukuraho ibibabi byarwaye; kureba amakuru y\'ibihe, cyangwa wabwira umwe mu banyabwenge.',
+}
+
+
 def translate_to_kinyarwanda(text):
     """
     Simple translation function for Kinyarwanda.
-    In a real app, you would use a proper translation API.
+    Known phrases come from TRANSLATIONS; anything else is sent to an online
+    translator when KINYARWANDA_ONLINE_TRANSLATION is on. This only runs when
+    a Disease is saved, never while serving a detection.
+    Returns '' when no translation is available, so the next save of the
+    Disease (or backfill_translations) tries again.
     """
-    translations = {
-        'Banana Bacterial Wilt': 'Indwara ya Banana yo kurwara kuri Bacteria',
-        'Maize Leaf Blight': 'Indwara y\'ibimera bya Maize',
-        'Potato Late Blight': 'Indwara ya Potato yo kurwara',
-        'Bacterial disease causing wilting and yellowing.': 'Indwara ya Bacteria ishobora gutuma ibimera byumva ubucucu no kuba umuhondo.',
-        'Fungal leaf spots reducing photosynthesis.': 'Ibiranga by\'ibimera bifite amabara y\'umweru bigabanya ubwoko bw\'ibimera.',
-        'Oomycete disease causing dark lesions on leaves and tubers.': 'Indwara ya Oomycete ishobora gutuma haba amabara y\'umukara kuri ibimera n\'ibinyabutumbura.',
-        'Rogue infected plants, sanitize tools, use clean planting material.': 'Kuraho ibimera byarwaye, gukoresha ibikoresho byo gusukura, gukoresha ibyatsi byo gutera byera.',
-        'Rotate crops, remove residue, apply recommended fungicide if severe.': 'Guhindura ibihingwa, gukuraho ibisigazwa, gukoresha ifungisidi zirinzwe niba byarakaze.',
-        'Use certified seed, ensure airflow, apply protective fungicide as advised.': 'Gukoresha imbuto zemewe, kureba neza ko umwuka uhagaze, gukoresha ifungisidi zirinzwe nk\'uko byavuzwe.',
-        'Maintain field hygiene; use resistant varieties; avoid tool sharing between fields, or contact one of our expert': 'Komeza gusana isambu; gukoresha ubwoko butakwicwa; kwirinda gusangiza ibikoresho hagati y\'amasambu, cyangwa wabwira umwe mu banyabwenge.',
-        'Ensure spacing for airflow; balanced fertilization; timely weeding, or contact one of our expert': 'Kureba neza intera yo gukoresha umwuka; gukoresha ifumbire yuzuye; kubagura ibyatsi mu bihe, cyangwa wabwira umwe mu banyabwenge.',
-        'Avoid overhead irrigation late in day; remove infected leaves; monitor weather alerts, or contact one of our expert': 'Kwirinda gutera amazi mu gihe cy\'umunsi; gukuraho ibibabi byarwaye; kureba amakuru y\'ibihe, cyangwa wabwira umwe mu banyabwenge.',
-    }
-    
-    return translations.get(text, f"Translation for: {text}")
\ No newline at end of file
+    if not text:
+        return ''
+    if text in TRANSLATIONS:
+        return TRANSLATIONS[text]
+    if settings.KINYARWANDA_ONLINE_TRANSLATION:
+        try:
+            return _translate_online(text)
+        except Exception as e:
+            print(f"Online translation failed: {e}")
+    return ''
+
+
+@lru_cache(maxsize=512)
+def _translate_online(text):
+    # Failures raise and are therefore not cached
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator(source='en', target='rw').translate(text)
+
+
+def translate_disease(disease, fields=None):
+    """Fill the ``<field>_rw`` columns of a Disease for the given source fields."""
+    for field in fields if fields is not None else disease.TRANSLATED_FIELDS:
+        setattr(disease, f'{field}_rw', translate_to_kinyarwanda(getattr(disease, field)))
+    return disease
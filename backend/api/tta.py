@@ -0,0 +1,102 @@
+"""
+High-accuracy detection: test-time augmentation over several crops.
+
+A single squashed resize of a phone photo can shrink small lesions to a
+few pixels. In ``tta`` mode the upload is decoded at DECODE_SCALE times the
+model input. Up to CROP_TTA_MAX_VIEWS views (the whole frame, its mirror,
+a centre zoom and four corner zooms) are cut from it, and all of them run
+through the model in one batched forward pass. Their class probabilities
+are averaged.
+
+The number of views is chosen per request so that the forward pass fits in
+what is left of CROP_TTA_BUDGET_MS. It is estimated from the recently
+measured cost per view and from the images already waiting in the
+micro-batching queue. Under load the mode therefore degrades towards a
+single view instead of piling up latency.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from .batching import scheduler
+from .inference import registry
+from .preprocessing import to_tensor
+
+DECODE_SCALE = 2
+
+# (left, top, right, bottom) as fractions of the decoded image, and whether
+# to mirror it; when the budget is tight, views are dropped from the end
+VIEWS = (
+    ('full', (0.0, 0.0, 1.0, 1.0), False),
+    ('full_flip', (0.0, 0.0, 1.0, 1.0), True),
+    ('center', (0.15, 0.15, 0.85, 0.85), False),
+    ('top_left', (0.0, 0.0, 0.7, 0.7), False),
+    ('top_right', (0.3, 0.0, 1.0, 0.7), False),
+    ('bottom_left', (0.0, 0.3, 0.7, 1.0), False),
+    ('bottom_right', (0.3, 0.3, 1.0, 1.0), False),
+    ('center_flip', (0.15, 0.15, 0.85, 0.85), True),
+)
+
+
+class ViewCost:
+    """Moving average of forward-pass milliseconds per view, shared by request threads."""
+
+    def __init__(self, smoothing=0.2):
+        self._lock = threading.Lock()
+        self.smoothing = smoothing
+        self.per_view_ms = None
+
+    def record(self, views, elapsed_ms):
+        sample = elapsed_ms / views
+        with self._lock:
+            if self.per_view_ms is None:
+                self.per_view_ms = sample
+            else:
+                self.per_view_ms += self.smoothing * (sample - self.per_view_ms)
+
+
+cost = ViewCost()
+
+
+def decode_size(input_size):
+    return (input_size[0] * DECODE_SCALE, input_size[1] * DECODE_SCALE)
+
+
+def view_count(elapsed_ms, budget_ms=None, max_views=None):
+    """How many views fit in the rest of the budget; at least one."""
+    budget_ms = budget_ms if budget_ms is not None else settings.CROP_TTA_BUDGET_MS
+    max_views = min(max_views or settings.CROP_TTA_MAX_VIEWS, len(VIEWS))
+    per_view = cost.per_view_ms
+    if per_view is None:
+        return max_views  # first request in this process measures the cost
+    # Images queued for the shared model run before (or alongside) ours
+    remaining = budget_ms - elapsed_ms - scheduler.pending() * per_view
+    return int(max(1, min(max_views, remaining // max(per_view, 1e-3))))
+
+
+def build_batch(image, input_size, count):
+    """Cut ``count`` views from a decoded RGB image into one (N, H, W, 3) batch."""
+    width, height = input_size
+    batch = np.empty((count, height, width, 3), dtype=np.float32)
+    for slot, (_, (left, top, right, bottom), mirror) in enumerate(VIEWS[:count]):
+        box = (left * image.width, top * image.height, right * image.width, bottom * image.height)
+        view = image.resize(input_size, Image.BILINEAR, box=box, reducing_gap=2.0)
+        to_tensor(view, out=batch[slot])
+        if mirror:
+            batch[slot] = batch[slot, :, ::-1]
+    return batch
+
+
+def predict(image, timer):
+    """Classify a decoded image with as many views as the budget allows."""
+    classifier = registry.get()
+    with timer.stage('augment'):
+        count = view_count(timer.elapsed_ms())
+        batch = build_batch(image, classifier.input_size, count)
+    with timer.stage('inference'):
+        probabilities = classifier.predict_batch(batch)
+    cost.record(count, timer.stages['inference'])
+    prediction = classifier.decode(probabilities.mean(axis=0))
+    return prediction, [name for name, _, _ in VIEWS[:count]]
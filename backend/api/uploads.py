@@ -0,0 +1,53 @@
+"""
+Upload handlers that hash files while they are received.
+
+Django's stock handlers buffer small uploads in memory and spool large
+ones to a temporary file; these do the same but also feed every chunk to
+SHA-256 on the way in and attach the digest as ``upload.sha256``. The
+dedup cache and the content-addressed storage read that attribute instead
+of reading the upload again. The storage then writes the in-memory buffer
+with a single write, or renames the temporary file into place. Each upload
+is therefore received once, hashed once and written to disk once.
+"""
+import hashlib
+import io
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingMixin:
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if getattr(self, 'activated', True):
+            self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        if upload is not None:
+            upload.sha256 = self.hasher.hexdigest()
+        return upload
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    """Uploads up to FILE_UPLOAD_MAX_MEMORY_SIZE, kept in a BytesIO."""
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    """Larger uploads, spooled to FILE_UPLOAD_TEMP_DIR."""
+
+
+def upload_digest(upload):
+    """The SHA-256 recorded by the handlers above, or None for other files."""
+    return getattr(upload, 'sha256', None) or getattr(getattr(upload, 'file', None), 'sha256', None)
+
+
+def memory_buffer(upload):
+    """A zero-copy view of an in-memory upload's bytes (release it after use), or None."""
+    raw = getattr(upload, 'file', None)
+    if isinstance(raw, io.BytesIO):
+        return raw.getbuffer()
+    return None
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views
 
 router = DefaultRouter()
 router.register(r'diseases', views.DiseaseViewSet, basename='disease')
@@ -13,6 +13,18 @@ urlpatterns = [
     
     # AI Detection endpoint
     path('ai-detect/', views.ai_detect, name='ai_detect'),
+    path('ai-detect/batch/', views.ai_detect_batch, name='ai_detect_batch'),
+    path('ai-detect/jobs/<int:pk>/', views.detection_job, name='detection_job'),
+
+    # Resized detection images for history listings
+    path('thumbnails/<path:name>', views.thumbnail, name='thumbnail'),
+
+    # Aggregated detection statistics
+    path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
+
+    # Async (ASGI) detection and history
+    path('async/ai-detect/', async_views.ai_detect, name='async_ai_detect'),
+    path('async/history/', async_views.history, name='async_history'),
     
     # Include router URLs
     path('', include(router.urls)),
@@ -1,5 +1,12 @@
-from django.shortcuts import render
-from django.contrib.auth import get_user_model, authenticate
+from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.urls import reverse
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.db.models import Q
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -8,15 +15,24 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import AllowAny
 
-from .models import Disease, DetectionHistory
+from .models import Disease, DetectionHistory, DetectionJob
 from .serializers import (
-    UserSerializer, RegisterSerializer, DiseaseSerializer, DetectionHistorySerializer
+    UserSerializer, RegisterSerializer, DiseaseSerializer, DetectionHistorySerializer,
+    DetectionHistoryListSerializer, DetectionJobSerializer
 )
-from .translator import translate_to_kinyarwanda
+from .dedup import content_hash, lookup, remember
+from .catalogue import catalogue
+from .detection import detection_result
+from .pagination import DetectionHistoryCursorPagination
+from .timing import StageTimer
+from . import analytics, metrics, passwords
 
-from PIL import Image
-import numpy as np
-import random
+from concurrent.futures import TimeoutError as FutureTimeout
+
+# The detection pipeline (NumPy, Pillow, the model runtime) is imported inside
+# the views that use it, so loading the URLconf for migrate, checks or other
+# management commands stays cheap. Serving processes import it once at boot
+# via registry.warm_up() in wsgi.py/asgi.py.
 
 
 # Get User Model
@@ -40,30 +56,55 @@ class RegisterView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if User.objects.filter(username=username).exists():
+        # Username and email in one query
+        duplicates = Q(username=username)
+        if email:
+            duplicates |= Q(email=email)
+        taken = list(User.objects.filter(duplicates).values_list("username", flat=True)[:2])
+
+        if username in taken:
             return Response(
                 {"error": "Username already exists. Please log in instead."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if email and User.objects.filter(email=email).exists():
+        if taken:
             return Response(
                 {"error": "Email already registered. Try logging in instead."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         # Proceed with creation
-        response = super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            user = serializer.save()
+        except passwords.HashingBusy:
+            return hashing_busy()
+        except IntegrityError:
+            # Registered concurrently since the check above
+            return Response(
+                {"error": "Username already exists. Please log in instead."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         # Auto-login after registration
-        user = User.objects.get(username=username)
         refresh = RefreshToken.for_user(user)
-        response.data.update({
+        data = dict(serializer.data)
+        data.update({
             "refresh": str(refresh),
             "access": str(refresh.access_token),
             "user": UserSerializer(user).data
         })
-        return response
+        return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(serializer.data))
+
+
+def hashing_busy():
+    return Response(
+        {"error": "Too many sign-ins right now. Please try again in a few seconds."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "5"}
+    )
 
 
 # Login View
@@ -73,7 +114,10 @@ class LoginView(APIView):
     def post(self, request):
         username = request.data.get("username")
         password = request.data.get("password")
-        user = authenticate(username=username, password=password)
+        try:
+            user = passwords.verify_login(username, password, request)
+        except passwords.HashingBusy:
+            return hashing_busy()
 
         if user is not None:
             refresh = RefreshToken.for_user(user)
@@ -100,6 +144,37 @@ class DiseaseViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
+    # Every app launch fetches the catalogue: answer JSON reads from the
+    # serialized copy in api/catalogue.py, and with 304 when it is unchanged
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return conditional_json(request, catalogue.published().listing)
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().retrieve(request, *args, **kwargs)
+        pk = str(kwargs.get('pk', ''))
+        representation = catalogue.published().by_id.get(int(pk)) if pk.isdigit() else None
+        if representation is None:
+            raise Http404("No Disease matches the given query.")
+        return conditional_json(request, representation)
+
+
+def conditional_json(request, representation):
+    """Serve a cached JSON body with its validators, or 304 if the client's copy is current."""
+    response = HttpResponse(representation.body, content_type='application/json')
+    response['ETag'] = representation.etag
+    last_modified = None
+    if representation.last_modified is not None:
+        last_modified = int(representation.last_modified.timestamp())
+        response['Last-Modified'] = http_date(last_modified)
+    # Public, but revalidated on every use so edits show up at once
+    patch_cache_control(response, public=True, no_cache=True)
+    return get_conditional_response(
+        request._request, etag=representation.etag, last_modified=last_modified, response=response
+    ) or response
+
 
 # Detection History ViewSet
 class DetectionHistoryViewSet(viewsets.ModelViewSet):
@@ -107,11 +182,24 @@ class DetectionHistoryViewSet(viewsets.ModelViewSet):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [permissions.IsAuthenticated]
 
+    pagination_class = DetectionHistoryCursorPagination
+
     def get_queryset(self):
         user = self.request.user
-        if user.is_staff or getattr(user, 'is_expert', False):
-            return DetectionHistory.objects.all().order_by('-detected_at')
-        return DetectionHistory.objects.filter(user=user).order_by('-detected_at')
+        queryset = DetectionHistory.objects.select_related('user', 'predicted_disease')
+        if not (user.is_staff or getattr(user, 'is_expert', False)):
+            queryset = queryset.filter(user=user)
+
+        # Expert dashboards narrow the list to one disease
+        disease = self.request.query_params.get('disease')
+        if disease and disease.isdigit():
+            queryset = queryset.filter(predicted_disease_id=int(disease))
+        return queryset.order_by('-detected_at', '-id')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return DetectionHistoryListSerializer
+        return DetectionHistorySerializer
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -122,90 +210,108 @@ class DetectionHistoryViewSet(viewsets.ModelViewSet):
 @permission_classes([permissions.IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
 def ai_detect(request):
+    """
+    Detect the disease in one uploaded `image`. Send `async=true` to queue it
+    for a worker, or `mode=tta` for the slower multi-crop mode (api/tta.py).
+    """
     print(" AI_DETECT endpoint called")
-    img = request.FILES.get('image')
+    timer = StageTimer()
+    # Multipart parsing (and hashing as the file arrives) happens on first access
+    with timer.stage('upload'):
+        img = request.FILES.get('image')
     if not img:
         print(" No image provided")
         return Response({"error": "Image is required"}, status=400)
 
     print(f" Image received: {img.name}, Size: {img.size} bytes")
-
-    # Validate image
+    from .inference import registry, ModelUnavailable
+    from .batching import predict_tensor
+    from .preprocessing import load_image, ImageRejected
+    from .prefilter import check_crop
+    from .jobs import enqueue
+    from . import tta
+
+    mode = str(request.data.get('mode', request.query_params.get('mode', 'standard'))).lower()
+    if mode not in ('standard', 'tta'):
+        return Response({"error": "mode must be 'standard' or 'tta'"}, status=400)
+    if mode == 'tta' and not settings.CROP_TTA_ENABLED:
+        mode = 'standard'
+
+    # Resubmitted photo: answer from the content-hash cache without re-detecting
+    # (only with a result from the same mode)
+    with timer.stage('hash'):
+        digest = content_hash(img)
+    with timer.stage('lookup'):
+        cached = lookup(digest, request.user, mode)
+    if cached is not None:
+        print(" Duplicate upload, returning cached result")
+        cached['timings_ms'] = timer.as_dict()
+        metrics.record_stages('ai_detect', timer)
+        metrics.detections.inc(endpoint='ai_detect', mode='cached')
+        return Response(cached)
+
+    # Validate and decode straight to the model input size (larger for crops)
     try:
         print(" Attempting to open image...")
-        image = Image.open(img).convert('RGB')
-        print(f" Image opened successfully. Dimensions: {image.size}")
-        # Basic image validation
-        if image.size[0] < 50 or image.size[1] < 50:
-            print(f" Image too small: {image.size}")
-            return Response({"error": "Image too small"}, status=400)
-        img.seek(0)  # Reset file pointer
-        print(" Image validation passed")
+        input_size = registry.input_size()
+        with timer.stage('decode'):
+            prepared = load_image(img, tta.decode_size(input_size) if mode == 'tta' else input_size)
+        print(
+            f" Image decoded at {prepared.decoded_size} from {prepared.original_size}, "
+            f"peak pixel memory {prepared.peak_bytes / 1e6:.1f} MB"
+        )
+    except ImageRejected as e:
+        print(f" Image rejected: {e}")
+        return Response({"error": str(e)}, status=400)
     except Exception as e:
         print(f" Image validation failed: {str(e)}")
         return Response({"error": f"Invalid image format: {str(e)}"}, status=400)
 
-    # Seed default diseases if empty
-    diseases = Disease.objects.all()
-    if not diseases.exists():
-        defaults = [
-            {
-                'name': 'Banana Bacterial Wilt',
-                'species': 'Banana',
-                'description': 'Bacterial disease causing wilting and yellowing.',
-                'treatment': 'Rogue infected plants, sanitize tools, use clean planting material.',
-                'care_tips': 'Maintain field hygiene; use resistant varieties; avoid tool sharing between fields, or contact one of our expert'
-            },
-            {
-                'name': 'Maize Leaf Blight',
-                'species': 'Maize',
-                'description': 'Fungal leaf spots reducing photosynthesis.',
-                'treatment': 'Rotate crops, remove residue, apply recommended fungicide if severe.',
-                'care_tips': 'Ensure spacing for airflow; balanced fertilization; timely weeding, or contact one of our expert'
-            },
+    # Reject non-crop photos before any model or database work
+    with timer.stage('prefilter'):
+        check = check_crop(prepared.tensor)
+    print(f" Pre-filter: green score {check.green_score}, foliage {check.green_fraction} in {check.elapsed_ms:.2f} ms")
+    if not check.passed:
+        return Response({"error": "Please upload a valid crop image"}, status=400)
+    print(" Image validation passed")
+
+    # Async mode: store the validated upload, queue it for a worker and return immediately
+    if str(request.data.get('async', request.query_params.get('async', ''))).lower() in ('1', 'true', 'yes'):
+        job = enqueue(request.user, img, mode)
+        print(f" Queued {mode} detection job {job.id}")
+        return Response(
             {
-                'name': 'Potato Late Blight',
-                'species': 'Potato',
-                'description': 'Oomycete disease causing dark lesions on leaves and tubers.',
-                'treatment': 'Use certified seed, ensure airflow, apply protective fungicide as advised.',
-                'care_tips': 'Avoid overhead irrigation late in day; remove infected leaves; monitor weather alerts, or contact one of our expert'
+                'status': job.status,
+                'job_id': job.id,
+                'status_url': request.build_absolute_uri(reverse('detection_job', args=[job.id])),
             },
-        ]
-        for d in defaults:
-            Disease.objects.get_or_create(
-                name=d['name'], 
-                species=d['species'],
-                defaults={
-                    'description': d['description'],
-                    'treatment': d['treatment'],
-                    'care_tips': d['care_tips']
-                }
-            )
-        diseases = Disease.objects.all()
+            status=status.HTTP_202_ACCEPTED
+        )
 
-    # Mock AI detection with random disease
+    # AI detection with the resident model
+    views = None
     try:
-        disease = random.choice(list(diseases))
-        confidence = round(random.uniform(0.7, 0.99), 2)
-        disease_data = DiseaseSerializer(disease).data
-
-        # Translation to Kinyarwanda
-        translated = {
-            'name_rw': translate_to_kinyarwanda(disease.name),
-            'description_rw': translate_to_kinyarwanda(disease.description),
-            'treatment_rw': translate_to_kinyarwanda(disease.treatment),
-            'care_tips_rw': translate_to_kinyarwanda(disease.care_tips),
-        }
+        if mode == 'tta':
+            prediction, views = tta.predict(prepared.image, timer)
+        else:
+            with timer.stage('inference'):
+                prediction = predict_tensor(prepared.tensor)
+    except (ModelUnavailable, FutureTimeout) as e:
+        print(f"Model unavailable: {e}")
+        return Response({
+            'status': 'error',
+            'message': 'Detection model is not available. Please try again later.'
+        }, status=503)
 
-        result = {
-            'status': 'success',
-            'predicted_disease': disease_data,
-            'confidence': confidence,
-            'recommendation': disease.treatment,
-            'crop_name': disease.species,
-            'care_tips': disease.care_tips,
-            'translation': translated,
-        }
+    try:
+        # Labels are Disease names; classes such as "Healthy" may have no row
+        with timer.stage('translation'):
+            disease = catalogue.get(prediction.label)
+            confidence = prediction.confidence
+            result = detection_result(prediction, disease)
+        result['mode'] = mode
+        if views is not None:
+            result['views'] = views
 
     except Exception as e:
         print(f"Detection error: {e}")
@@ -217,18 +323,204 @@ def ai_detect(request):
 
     # Save detection history
     try:
-        detection = DetectionHistory.objects.create(
-            user=request.user,
-            image=img,
-            predicted_disease=disease,
-            confidence=confidence
-        )
+        with timer.stage('save'):
+            detection = DetectionHistory.objects.create(
+                user=request.user,
+                image=img,
+                predicted_disease=disease,
+                confidence=confidence
+            )
         result['detection_id'] = detection.id
         result['detected_at'] = detection.detected_at
+        remember(digest, request.user, detection, result, mode)
 
     except Exception as e:
         print(f"History save error: {e}")
         # Continue even if history save fails
 
-    print(f" Returning success response with disease: {disease.name}")
-    return Response(result)
\ No newline at end of file
+    result['timings_ms'] = timer.as_dict()
+    metrics.record_stages('ai_detect', timer)
+    metrics.detections.inc(endpoint='ai_detect', mode=mode)
+    print(f" Returning success response with class: {prediction.label} ({mode}, {result['timings_ms']['total']} ms)")
+    return Response(result)
+
+
+# Batch AI Detection Endpoint
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def ai_detect_batch(request):
+    """Detect diseases on many images uploaded as repeated `images` fields."""
+    timer = StageTimer()
+    with timer.stage('upload'):
+        files = request.FILES.getlist('images')
+    if not files:
+        return Response({"error": "At least one image is required"}, status=400)
+    if len(files) > settings.CROP_BATCH_UPLOAD_MAX:
+        return Response(
+            {"error": f"At most {settings.CROP_BATCH_UPLOAD_MAX} images per request"},
+            status=400
+        )
+
+    import numpy as np
+    from .inference import registry, ModelUnavailable
+    from .preprocessing import load_image, ImageRejected
+    from .prefilter import check_crop
+
+    # Validate every upload and decode it straight into its slot of one batch tensor
+    input_size = registry.input_size()
+    batch = np.empty((len(files), input_size[1], input_size[0], 3), dtype=np.float32)
+    results = [None] * len(files)
+    valid = []
+    digests = {}
+    # The same photo twice in one upload is decoded, classified and stored once
+    first_seen = {}
+    repeats = {}
+    for index, img in enumerate(files):
+        with timer.stage('hash'):
+            digests[index] = content_hash(img)
+        if digests[index] in first_seen:
+            repeats[index] = first_seen[digests[index]]
+            continue
+        first_seen[digests[index]] = index
+        with timer.stage('lookup'):
+            cached = lookup(digests[index], request.user)
+        if cached is not None:
+            results[index] = dict(cached, image=img.name)
+            continue
+        try:
+            with timer.stage('decode'):
+                prepared = load_image(img, input_size, out=batch[len(valid)])
+            with timer.stage('prefilter'):
+                passed = check_crop(prepared.tensor).passed
+            if not passed:
+                results[index] = {'status': 'error', 'image': img.name, 'error': "Please upload a valid crop image"}
+                continue
+            valid.append((index, img))
+        except ImageRejected as e:
+            results[index] = {'status': 'error', 'image': img.name, 'error': str(e)}
+        except Exception as e:
+            results[index] = {'status': 'error', 'image': img.name, 'error': f"Invalid image format: {str(e)}"}
+
+    if valid:
+        # One forward pass for the whole upload
+        try:
+            classifier = registry.get()
+            with timer.stage('inference'):
+                predictions = [classifier.decode(row) for row in classifier.predict_batch(batch[:len(valid)])]
+        except ModelUnavailable as e:
+            print(f"Model unavailable: {e}")
+            return Response({
+                'status': 'error',
+                'message': 'Detection model is not available. Please try again later.'
+            }, status=503)
+
+        # Serialize each distinct disease once
+        responses = {}
+        detections = []
+        for (index, img), prediction in zip(valid, predictions):
+            if prediction.label not in responses:
+                with timer.stage('translation'):
+                    responses[prediction.label] = detection_result(prediction, catalogue.get(prediction.label))
+            result = dict(responses[prediction.label], confidence=prediction.confidence, image=img.name)
+            results[index] = result
+            detections.append(DetectionHistory(
+                user=request.user,
+                image=img,
+                predicted_disease=catalogue.get(prediction.label),
+                confidence=prediction.confidence
+            ))
+
+        try:
+            with timer.stage('save'):
+                DetectionHistory.objects.bulk_create(detections)
+                # bulk_create skips post_save, so update the rollups here
+                analytics.record_many(detections)
+            for (index, _), detection in zip(valid, detections):
+                results[index]['detection_id'] = detection.id
+                results[index]['detected_at'] = detection.detected_at
+                remember(digests[index], request.user, detection, results[index])
+        except Exception as e:
+            print(f"History save error: {e}")
+            # Continue even if history save fails
+
+    for index, original in repeats.items():
+        results[index] = dict(results[original], image=files[index].name)
+        if results[index].get('status') != 'error':
+            results[index]['cached'] = True
+
+    metrics.record_stages('ai_detect_batch', timer)
+    metrics.detections.inc(len(valid), endpoint='ai_detect_batch', mode='standard')
+    return Response({
+        'status': 'success',
+        'count': len(results),
+        'results': results,
+    })
+
+
+
+# Detection Job Status Endpoint
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def detection_job(request, pk):
+    """
+    Status of an async detection; `?wait=N` long-polls up to N seconds
+    (capped at CROP_JOB_MAX_WAIT) for the result.
+    """
+    from .jobs import wait_for
+    jobs = DetectionJob.objects.all() if request.user.is_staff else DetectionJob.objects.filter(user=request.user)
+    job = get_object_or_404(jobs, pk=pk)
+
+    try:
+        wait = float(request.query_params.get('wait', 0))
+    except ValueError:
+        wait = 0
+    if wait > 0 and not job.is_finished:
+        job = wait_for(job, wait)
+
+    return Response(DetectionJobSerializer(job).data)
+
+
+# Thumbnail Endpoint
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def thumbnail(request, name):
+    from django.utils.crypto import constant_time_compare
+    from . import thumbnails
+    from .serializers import thumbnail_signature
+    # <img> tags cannot send the JWT; the signed link stands in for it
+    signed = constant_time_compare(request.GET.get('sig', ''), thumbnail_signature(name))
+    if not signed or not thumbnails.is_detection_image(name):
+        raise Http404("Unknown image")
+    original = thumbnails.image_storage().url(name)
+    try:
+        thumb = thumbnails.ensure(name)
+    except thumbnails.Busy:
+        return redirect(original)
+    except FileNotFoundError:
+        raise Http404("Image file missing")
+    except Exception as e:
+        print(f"Thumbnail error for {name}: {e}")
+        return redirect(original)
+    if thumb is None:
+        raise Http404("Unknown image")
+    response = redirect(thumbnails.image_storage().url(thumb))
+    patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+    return response
+
+
+# Analytics Endpoint (experts and staff)
+class AnalyticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Detection totals over the last `?days=` days (default 30, max 366), read from the rollup tables."""
+        user = request.user
+        if not (user.is_staff or getattr(user, 'is_expert', False)):
+            return Response({"error": "Only experts can view analytics"}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+        except ValueError:
+            days = 30
+        return Response(analytics.summary(days))
@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cropdetector.settings')
+# Leaves the sync-only WhiteNoise middleware out (see settings.MIDDLEWARE)
+os.environ['CROP_ASGI'] = 'True'
 
-application = get_asgi_application()
+# /static/ is answered here, before the (fully async) middleware chain
+application = ASGIStaticFilesHandler(get_asgi_application())
+
+# Load the pipeline, catalogue and AI model once so requests never pay for them
+from cropdetector.serving import prepare  # noqa: E402
+prepare()
@@ -0,0 +1,51 @@
+"""
+Process start-up for the WSGI/ASGI entry points.
+
+With gunicorn's ``preload_app`` (see gunicorn.conf.py) the application is
+imported once in the master. Everything built here is then inherited by the
+forked workers, which share those pages copy-on-write instead of each
+building its own copy. The model itself is loaded after fork
+(``load_model``), because TensorFlow and ONNX Runtime start thread pools
+that do not survive a fork. The TFLite backend maps its weights file
+read-only, so its weights are shared through the page cache anyway.
+"""
+import importlib
+import os
+
+from django.conf import settings
+from django.db import connections
+
+
+def model_loads_after_fork():
+    """True when gunicorn.conf.py preloads the app and defers the model to each worker."""
+    return os.getenv("CROP_MODEL_LOAD_AFTER_FORK") == "True"
+
+
+def load_shared_state():
+    """Import the URLconf and detection pipeline, and fill the disease catalogue."""
+    importlib.import_module(settings.ROOT_URLCONF)
+    for module in ('api.batching', 'api.preprocessing', 'api.prefilter', 'api.thumbnails', 'api.jobs'):
+        importlib.import_module(module)
+
+    from api.catalogue import catalogue
+    from api.inference import registry
+
+    try:
+        catalogue.all()
+    except Exception as e:
+        print(" Disease catalogue not preloaded:", e)
+    registry.import_runtime()
+    # Never hand a database connection to forked workers
+    connections.close_all()
+
+
+def load_model():
+    from api.inference import registry
+    return registry.warm_up()
+
+
+def prepare():
+    """Called at the end of wsgi.py/asgi.py."""
+    load_shared_state()
+    if not model_loads_after_fork():
+        load_model()
@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",        
+    "api.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",   
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -63,6 +64,13 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Under ASGI (cropdetector/asgi.py sets CROP_ASGI) every middleware must be
+# async-capable, or Django runs async views through async_to_sync. WhiteNoise
+# is sync-only, so there static files are served by asgi.py instead.
+CROP_ASGI = os.getenv("CROP_ASGI") == "True"
+if CROP_ASGI:
+    MIDDLEWARE.remove("whitenoise.middleware.WhiteNoiseMiddleware")
+
 # URLS & WSGI
 ROOT_URLCONF = "cropdetector.urls"
 
@@ -113,6 +121,30 @@ AUTH_PASSWORD_VALIDATORS = [
 # AUTH MODEL
 AUTH_USER_MODEL = "api.User"
 
+# PASSWORD HASHING
+# CROP_PASSWORD_HASHER is used for new passwords: pbkdf2 (Django's default),
+# scrypt, or argon2 (needs argon2-cffi; costs below). Hashes made by the others
+# keep working and are re-hashed with it at the user's next login.
+_PASSWORD_HASHERS = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "argon2": "api.hashers.TunedArgon2PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+}
+CROP_PASSWORD_HASHER = os.getenv("CROP_PASSWORD_HASHER", "pbkdf2")
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[CROP_PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != CROP_PASSWORD_HASHER
+] + ["django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher"]
+CROP_ARGON2_TIME_COST = int(os.getenv("CROP_ARGON2_TIME_COST", "2"))
+CROP_ARGON2_MEMORY_COST = int(os.getenv("CROP_ARGON2_MEMORY_COST", "19456"))  # KiB
+CROP_ARGON2_PARALLELISM = int(os.getenv("CROP_ARGON2_PARALLELISM", "1"))
+# Per worker (api/passwords.py): CROP_PASSWORD_HASH_WORKERS hashes run at once;
+# up to CROP_PASSWORD_HASH_MAX_PENDING logins/registrations hash or wait for a
+# slot, each for at most CROP_PASSWORD_HASH_WAIT seconds, before answering 503.
+# Keep MAX_PENDING below gunicorn's threads so detection is never starved.
+CROP_PASSWORD_HASH_WORKERS = int(os.getenv("CROP_PASSWORD_HASH_WORKERS", "2"))
+CROP_PASSWORD_HASH_MAX_PENDING = int(os.getenv("CROP_PASSWORD_HASH_MAX_PENDING", "3"))
+CROP_PASSWORD_HASH_WAIT = float(os.getenv("CROP_PASSWORD_HASH_WAIT", "5"))
+
 # INTERNATIONALIZATION
 
 LANGUAGE_CODE = "en-us"
@@ -135,8 +167,137 @@ STORAGES = {
     },
 }
 
+# Detection images are stored once per distinct content, named by SHA-256 and
+# sharded into nested directories (api/storage.py). CROP_MEDIA_STORAGE=s3 keeps
+# them in an S3-compatible bucket instead, e.g. a local MinIO at
+# AWS_S3_ENDPOINT_URL=http://localhost:9000 (needs django-storages[s3]).
+CROP_MEDIA_STORAGE = os.getenv("CROP_MEDIA_STORAGE", "filesystem")
+if CROP_MEDIA_STORAGE == "s3":
+    STORAGES["detections"] = {
+        "BACKEND": "api.s3_storage.ContentAddressedS3Storage",
+        "OPTIONS": {
+            "bucket_name": os.getenv("AWS_STORAGE_BUCKET_NAME", "crop-detector-media"),
+            "endpoint_url": os.getenv("AWS_S3_ENDPOINT_URL"),
+            "access_key": os.getenv("AWS_ACCESS_KEY_ID"),
+            "secret_key": os.getenv("AWS_SECRET_ACCESS_KEY"),
+            "region_name": os.getenv("AWS_S3_REGION_NAME"),
+            "querystring_auth": False,
+        },
+    }
+else:
+    STORAGES["detections"] = {
+        "BACKEND": "api.storage.ContentAddressedStorage",
+    }
+
 MEDIA_URL = "/media/"
-MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", os.path.join(BASE_DIR, "media"))
+
+# Uploads are hashed as they arrive (api/uploads.py). Large ones are spooled to
+# FILE_UPLOAD_TEMP_DIR; on the same filesystem as MEDIA_ROOT they are then
+# renamed into place rather than copied.
+FILE_UPLOAD_HANDLERS = [
+    "api.uploads.HashingMemoryFileUploadHandler",
+    "api.uploads.HashingTemporaryFileUploadHandler",
+]
+FILE_UPLOAD_TEMP_DIR = os.getenv("FILE_UPLOAD_TEMP_DIR")
+
+# History thumbnails: longest side in pixels, WEBP or JPEG
+CROP_THUMBNAIL_SIZE = int(os.getenv("CROP_THUMBNAIL_SIZE", "320"))
+CROP_THUMBNAIL_FORMAT = os.getenv("CROP_THUMBNAIL_FORMAT", "WEBP")
+CROP_THUMBNAIL_QUALITY = 75
+# Renders at once per process; requests beyond that are sent the original
+CROP_THUMBNAIL_MAX_CONCURRENT = int(os.getenv("CROP_THUMBNAIL_MAX_CONCURRENT", "2"))
+
+
+# AI MODEL CONFIGURATION
+
+# Inference runtime: "keras" (TensorFlow), or "onnx" / "tflite" for a model
+# exported with `python manage.py export_model`, which avoid loading TensorFlow.
+CROP_MODEL_BACKEND = os.getenv("CROP_MODEL_BACKEND", "keras")
+_MODEL_FILES = {"keras": "crop_classifier.keras", "onnx": "crop_classifier.onnx", "tflite": "crop_classifier.tflite"}
+# Trained model (for keras: .keras/.h5 file or SavedModel directory) and its labels,
+# a JSON list of Disease names in the model's output order.
+CROP_MODEL_PATH = os.getenv(
+    "CROP_MODEL_PATH",
+    os.path.join(BASE_DIR, "ml_models", _MODEL_FILES.get(CROP_MODEL_BACKEND, "crop_classifier.keras"))
+)
+CROP_MODEL_LABELS = os.getenv("CROP_MODEL_LABELS", os.path.join(BASE_DIR, "ml_models", "labels.json"))
+# Used only when the model does not declare its own input shape
+CROP_MODEL_INPUT_SIZE = (224, 224)
+# CPU threads per forward pass for the onnx/tflite backends (0 = runtime default)
+CROP_MODEL_THREADS = int(os.getenv("CROP_MODEL_THREADS", "0"))
+# tflite only: run on builtin kernels so all workers share the mmapped weights
+# instead of each holding an XNNPACK-repacked copy (slower per image)
+CROP_TFLITE_SHARED_WEIGHTS = os.getenv("CROP_TFLITE_SHARED_WEIGHTS", "False") == "True"
+# Uploads are rejected from their header alone outside this range
+CROP_MAX_IMAGE_PIXELS = int(os.getenv("CROP_MAX_IMAGE_PIXELS", str(60_000_000)))
+CROP_MIN_IMAGE_SIDE = 50
+
+# Colour pre-filter that rejects non-crop photos before model/DB work.
+# An image passes if either the excess-green score or the foliage-hue share is high enough.
+CROP_PREFILTER_ENABLED = os.getenv("CROP_PREFILTER_ENABLED", "True") == "True"
+CROP_PREFILTER_MIN_GREEN_SCORE = float(os.getenv("CROP_PREFILTER_MIN_GREEN_SCORE", "5.0"))
+CROP_PREFILTER_MIN_GREEN_FRACTION = float(os.getenv("CROP_PREFILTER_MIN_GREEN_FRACTION", "0.25"))
+CROP_PREFILTER_HUE_RANGE = (35.0, 170.0)
+CROP_PREFILTER_MIN_SATURATION = 0.2
+
+# Resubmitted uploads (same SHA-256) are answered from a per-worker cache
+CROP_DEDUP_ENABLED = os.getenv("CROP_DEDUP_ENABLED", "True") == "True"
+CROP_DEDUP_MAX_ENTRIES = int(os.getenv("CROP_DEDUP_MAX_ENTRIES", "2048"))
+CROP_DEDUP_TTL = int(os.getenv("CROP_DEDUP_TTL", str(60 * 60)))  # seconds
+
+# Each worker keeps the Disease table in memory; edits made through another
+# worker are picked up after at most this many seconds
+CROP_CATALOGUE_TTL = int(os.getenv("CROP_CATALOGUE_TTL", "300"))
+
+# Validated JWTs (until they expire) and their users are cached per worker
+# (api/authentication.py). A user saved in this worker is dropped at once; one
+# changed through another worker (admin deactivation, QuerySet.update()) keeps
+# authenticating there for up to CROP_AUTH_CACHE_TTL seconds.
+CROP_AUTH_CACHE_TTL = int(os.getenv("CROP_AUTH_CACHE_TTL", "60"))
+CROP_AUTH_CACHE_MAX_ENTRIES = int(os.getenv("CROP_AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+# Async detection jobs (python manage.py run_detection_worker)
+CROP_JOB_POLL_INTERVAL = float(os.getenv("CROP_JOB_POLL_INTERVAL", "0.25"))  # seconds
+# Long-polls on /api/ai-detect/jobs/<id>/?wait= hold a request thread: at most
+# CROP_JOB_MAX_WAITERS per worker, each for at most CROP_JOB_MAX_WAIT seconds.
+# Further polls get the current status straight away.
+CROP_JOB_MAX_WAIT = int(os.getenv("CROP_JOB_MAX_WAIT", "5"))
+CROP_JOB_MAX_WAITERS = int(os.getenv("CROP_JOB_MAX_WAITERS", "1"))
+CROP_JOB_STALE_AFTER = 120  # running jobs older than this are requeued
+CROP_JOB_MAX_ATTEMPTS = 3
+
+# Thread pool for CPU work (hashing, decoding) in the ASGI views of api/async_views.py
+CROP_ASYNC_EXECUTOR_WORKERS = int(os.getenv("CROP_ASYNC_EXECUTOR_WORKERS", "4"))
+
+# Micro-batching: concurrent detections within the wait window share one forward pass
+CROP_BATCHING_ENABLED = os.getenv("CROP_BATCHING_ENABLED", "True") == "True"
+CROP_BATCH_MAX_SIZE = int(os.getenv("CROP_BATCH_MAX_SIZE", "8"))
+CROP_BATCH_MAX_WAIT_MS = float(os.getenv("CROP_BATCH_MAX_WAIT_MS", "5"))
+CROP_INFERENCE_TIMEOUT = float(os.getenv("CROP_INFERENCE_TIMEOUT", "30"))
+# mode=tta on /api/ai-detect/: up to CROP_TTA_MAX_VIEWS crops/flips in one forward
+# pass, cut down so the request stays within CROP_TTA_BUDGET_MS (api/tta.py)
+CROP_TTA_ENABLED = os.getenv("CROP_TTA_ENABLED", "True") == "True"
+CROP_TTA_MAX_VIEWS = int(os.getenv("CROP_TTA_MAX_VIEWS", "8"))
+CROP_TTA_BUDGET_MS = float(os.getenv("CROP_TTA_BUDGET_MS", "800"))
+# Maximum number of images accepted by /api/ai-detect/batch/
+CROP_BATCH_UPLOAD_MAX = int(os.getenv("CROP_BATCH_UPLOAD_MAX", "50"))
+
+# Prometheus metrics at /metrics (api/metrics.py), served only to these addresses.
+# With several worker processes, each writes its counters to CROP_METRICS_DIR
+# (gunicorn.conf.py sets it) so a scrape reports all of them.
+CROP_METRICS_ENABLED = os.getenv("CROP_METRICS_ENABLED", "True") == "True"
+CROP_METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.getenv("CROP_METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip()
+]
+CROP_METRICS_DIR = os.getenv("CROP_METRICS_DIR", "")
+CROP_METRICS_FLUSH_INTERVAL = float(os.getenv("CROP_METRICS_FLUSH_INTERVAL", "5"))
+
+
+# TRANSLATION
+# Disease text is translated to Kinyarwanda when it is saved. Phrases missing from
+# api/translator.py are sent to Google Translate (deep-translator) only if enabled.
+KINYARWANDA_ONLINE_TRANSLATION = os.getenv("KINYARWANDA_ONLINE_TRANSLATION", "False") == "True"
 
 
 # CORS CONFIGURATION - UPDATED WITH YOUR ACTUAL URLS 
@@ -177,6 +338,11 @@ CORS_ALLOW_HEADERS = [
     "x-requested-with",
 ]
 
+# Read by the frontend to retry busy logins/sign-ups (api/passwords.py)
+CORS_EXPOSE_HEADERS = [
+    "retry-after",
+]
+
 # CSRF trusted origins
 CSRF_TRUSTED_ORIGINS = [
     "https://git-4-8zex.onrender.com",
@@ -188,8 +354,12 @@ CSRF_TRUSTED_ORIGINS = [
 # REST FRAMEWORK CONFIGURATION
 
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -218,7 +388,8 @@ SIMPLE_JWT = {
 # SECURITY SETTINGS FOR PRODUCTION
 
 if not DEBUG:
-    SECURE_SSL_REDIRECT = True
+    # False only for plain-HTTP runs on localhost, e.g. manage.py benchmark_api
+    SECURE_SSL_REDIRECT = os.getenv("SECURE_SSL_REDIRECT", "True") == "True"
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
     SECURE_BROWSER_XSS_FILTER = True
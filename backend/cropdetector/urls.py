@@ -10,6 +10,8 @@ from django.http import JsonResponse
 from django.db import connection
 from django.views.generic.base import RedirectView
 
+from api.metrics import metrics_view
+
 
 def health_check(request):
     """
@@ -59,6 +61,9 @@ urlpatterns = [
     # Health check endpoint (for Render)
     path('health/', health_check, name='health_check'),
     
+    # Prometheus scrape endpoint (local addresses only)
+    path('metrics', metrics_view, name='metrics'),
+
     # Admin interface
     path('admin/', admin.site.urls),
     
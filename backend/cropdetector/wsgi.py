@@ -13,3 +13,8 @@ try:
     print(" Database ready!")
 except Exception as e:
     print(" Auto-migration failed:", e)
+
+# LOAD THE PIPELINE, CATALOGUE AND AI MODEL ONCE so requests never pay for them
+# (once in the gunicorn master when preloading, see gunicorn.conf.py)
+from cropdetector.serving import prepare
+prepare()
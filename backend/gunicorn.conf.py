@@ -0,0 +1,56 @@
+"""
+Gunicorn settings, read automatically from the working directory.
+
+The app is preloaded in the master (GUNICORN_PRELOAD=True), so Django,
+NumPy/Pillow, the model runtime library and the disease catalogue are
+loaded once and shared copy-on-write by every worker. Raising
+WEB_CONCURRENCY then mostly costs each worker's own request memory and,
+for the keras/onnx backends, its copy of the model, which is loaded after
+fork. Use CROP_MODEL_BACKEND=tflite with CROP_TFLITE_SHARED_WEIGHTS=True
+to share the weights too.
+
+    gunicorn cropdetector.wsgi:application
+    gunicorn -k uvicorn.workers.UvicornWorker cropdetector.asgi:application
+"""
+import gc
+import glob
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+if preload_app:
+    os.environ["CROP_MODEL_LOAD_AFTER_FORK"] = "True"
+
+# Workers write their metrics here so /metrics can report all of them (api/metrics.py)
+os.environ.setdefault(
+    "CROP_METRICS_DIR", os.path.join(tempfile.gettempdir(), f"cropdetector-metrics-{os.getenv('PORT', '8000')}")
+)
+
+
+def on_starting(server):
+    # Counters restart from zero with the server
+    for path in glob.glob(os.path.join(os.environ["CROP_METRICS_DIR"], "*.json")):
+        os.remove(path)
+
+
+def when_ready(server):
+    if preload_app:
+        # Keep the collector from writing to (and so un-sharing) preloaded objects
+        gc.freeze()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from cropdetector.serving import load_model
+        load_model()
@@ -13,4 +13,4 @@ echo "Running migrations..."
 python manage.py migrate --noinput
 
 echo "Starting Gunicorn..."
-gunicorn --bind 0.0.0.0:8000 cropdetector.wsgi:application
+gunicorn cropdetector.wsgi:application  # settings in gunicorn.conf.py
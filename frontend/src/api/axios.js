@@ -49,6 +49,10 @@ api.interceptors.request.use(
   }
 );
 
+// Busy responses (503 with Retry-After, e.g. logins during a sign-up burst)
+// are retried this many times after the delay the server asks for
+const MAX_BUSY_RETRIES = 3;
+
 // Response interceptor
 api.interceptors.response.use(
   (response) => {
@@ -58,6 +62,14 @@ api.interceptors.response.use(
   (error) => {
     console.error(` Response error: Status ${error.response?.status}`, error.message);
     console.error('Response data:', error.response?.data);
+
+    const config = error.config;
+    const retryAfter = Number(error.response?.headers?.['retry-after']);
+    if (error.response?.status === 503 && retryAfter > 0 && config && (config._busyRetries ?? 0) < MAX_BUSY_RETRIES) {
+      config._busyRetries = (config._busyRetries ?? 0) + 1;
+      console.warn(` 503 Busy - retrying in ${retryAfter}s (attempt ${config._busyRetries})`);
+      return new Promise((resolve) => setTimeout(resolve, retryAfter * 1000)).then(() => api(config));
+    }
     
     // Handl Unauthorization and redirections
     if (error.response?.status === 401) {
@@ -80,4 +92,12 @@ api.interceptors.response.use(
   }
 );
 
+// History is cursor-paginated: { next, previous, results }. Pass the `next`
+// link of the page already shown to fetch the one after it.
+export async function fetchHistoryPage(next) {
+  const cursor = next ? new URL(next).searchParams.get('cursor') : null;
+  const { data } = await api.get('history/', { params: cursor ? { cursor } : {} });
+  return { results: data.results ?? data, next: data.next ?? null };
+}
+
 export default api;
\ No newline at end of file
@@ -1,8 +1,10 @@
 import React, { useEffect, useState } from 'react'
-import { api } from '../api/axios.js'
+import { api, fetchHistoryPage } from '../api/axios.js'
 
 export default function AdminDashboard({ auth }) {
   const [detections, setDetections] = useState([])
+  const [nextDetections, setNextDetections] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [diseases, setDiseases] = useState([])
   const [form, setForm] = useState({ 
     name: '', 
@@ -22,11 +24,12 @@ export default function AdminDashboard({ auth }) {
     ;(async () => {
       try {
         const [dhist, ddise] = await Promise.all([
-          api.get('history/'),
+          fetchHistoryPage(),
           api.get('diseases/'),
         ])
         if (mounted) {
-          setDetections(dhist.data)
+          setDetections(dhist.results)
+          setNextDetections(dhist.next)
           setDiseases(ddise.data)
         }
       } catch (e) {
@@ -39,6 +42,20 @@ export default function AdminDashboard({ auth }) {
     return () => { mounted = false }
   }, [auth])
 
+  const loadMoreDetections = async () => {
+    setLoadingMore(true)
+    try {
+      const page = await fetchHistoryPage(nextDetections)
+      setDetections((prev) => [...prev, ...page.results])
+      setNextDetections(page.next)
+    } catch (e) {
+      console.error('Failed to load more detections:', e)
+      setError('Failed to load admin data')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const submitDisease = async (e) => {
     e.preventDefault()
     setError('')
@@ -167,7 +184,7 @@ export default function AdminDashboard({ auth }) {
 
       <section className="card">
         <h3 className="text-lg font-semibold mb-4">
-          All User Detections ({detections.length})
+          All User Detections ({detections.length}{nextDetections ? '+' : ''})
         </h3>
         <div className="space-y-3 max-h-96 overflow-y-auto">
           {detections.map((x) => (
@@ -188,6 +205,15 @@ export default function AdminDashboard({ auth }) {
             </div>
           ))}
         </div>
+        {nextDetections && (
+          <button
+            onClick={loadMoreDetections}
+            disabled={loadingMore}
+            className="mt-3 text-sm text-forest underline"
+          >
+            {loadingMore ? 'Loading...' : 'Load more detections'}
+          </button>
+        )}
       </section>
     </div>
   )
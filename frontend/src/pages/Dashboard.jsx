@@ -1,10 +1,12 @@
 import React, { useEffect, useState } from 'react'
-import { api } from '../api/axios.js'
+import { fetchHistoryPage } from '../api/axios.js'
 import { Link } from 'react-router-dom'
 
 export default function Dashboard({ auth }) {
   const [items, setItems] = useState([])
+  const [next, setNext] = useState(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [error, setError] = useState('')
 
   useEffect(() => {
@@ -16,8 +18,11 @@ export default function Dashboard({ auth }) {
     }
     ;(async () => {
       try {
-        const { data } = await api.get('history/')
-        if (mounted) setItems(data)
+        const page = await fetchHistoryPage()
+        if (mounted) {
+          setItems(page.results)
+          setNext(page.next)
+        }
       } catch (e) {
         console.error('Failed to load detection history:', e)
         setError('Failed to load detection history')
@@ -28,6 +33,20 @@ export default function Dashboard({ auth }) {
     return () => { mounted = false }
   }, [auth?.user?.access])
 
+  const loadMore = async () => {
+    setLoadingMore(true)
+    try {
+      const page = await fetchHistoryPage(next)
+      setItems((prev) => [...prev, ...page.results])
+      setNext(page.next)
+    } catch (e) {
+      console.error('Failed to load more detections:', e)
+      setError('Failed to load detection history')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   return (
     <div>
       <div className="flex items-center justify-between mb-6">
@@ -81,7 +100,7 @@ export default function Dashboard({ auth }) {
               {d.image && (
                 <div className="mb-3">
                   <img 
-                    src={d.image} 
+                    src={d.thumbnail_url || d.image} 
                     alt="Detection" 
                     className="w-full h-32 object-cover rounded"
                   />
@@ -95,6 +114,14 @@ export default function Dashboard({ auth }) {
           ))}
         </div>
       )}
+
+      {!loading && !error && next && (
+        <div className="text-center mt-6">
+          <button onClick={loadMore} disabled={loadingMore} className="btn-primary">
+            {loadingMore ? 'Loading...' : 'Load More'}
+          </button>
+        </div>
+      )}
     </div>
   )
 }